@@ -0,0 +1,94 @@
+from datetime import datetime
+
+from django.core.files.storage import default_storage
+
+# Поле ответа и путь к нему в запросе. Точка в имени — вложенный объект:
+# автор и группа приходят тем же запросом через JOIN.
+AUTHOR_FIELDS = {
+    'author.id': 'author_id',
+    'author.username': 'author__username',
+    'author.first_name': 'author__first_name',
+    'author.last_name': 'author__last_name',
+}
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'image': 'image',
+    'comments_count': 'comments_count',
+    **AUTHOR_FIELDS,
+    'group.id': 'group_id',
+    'group.slug': 'group__slug',
+    'group.title': 'group__title',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'post': 'post_id',
+    'text': 'text',
+    'created': 'created',
+    **AUTHOR_FIELDS,
+}
+GROUP_FIELDS = {
+    'id': 'id',
+    'slug': 'slug',
+    'title': 'title',
+    'description': 'description',
+    **{
+        f'stats.{name}_{window}': f'{name}_{window}'
+        for name in ('posts', 'comments', 'authors')
+        for window in ('hour', 'day', 'week')
+    },
+}
+FOLLOW_FIELDS = {
+    'id': 'id',
+    'author.id': 'author_id',
+    'author.username': 'author__username',
+}
+FILE_FIELDS = {'image'}
+
+
+def select_fields(fields, requested=None):
+    """Поля из ?fields=: имена через запятую; имя вложенного объекта
+    выбирает все его поля. Без параметра выбираются все поля."""
+    if not requested:
+        return fields
+    selected = {}
+    for name in requested.split(','):
+        name = name.strip()
+        matched = {
+            field: lookup for field, lookup in fields.items()
+            if field == name or field.startswith(name + '.')
+        }
+        if not matched:
+            raise ValueError(f'Неизвестное поле {name!r}')
+        selected.update(matched)
+    return selected
+
+
+def row_lookups(fields, *required):
+    """Пути для values_list: выбранные поля и поля ключа курсора."""
+    return list(dict.fromkeys([*required, *fields.values()]))
+
+
+def serialize(row, fields):
+    """Словарь для JSON из строки values_list(named=True) без создания
+    моделей."""
+    data = {}
+    for field, lookup in fields.items():
+        value = getattr(row, lookup)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif lookup in FILE_FIELDS:
+            value = default_storage.url(value) if value else None
+        *parents, name = field.split('.')
+        target = data
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[name] = value
+    for name, value in data.items():
+        # Пустой LEFT JOIN — объекта нет, например поста без группы.
+        if isinstance(value, dict) and all(
+            item is None for item in value.values()
+        ):
+            data[name] = None
+    return data
@@ -0,0 +1,134 @@
+import base64
+import json
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts import conditional
+from posts.models import Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(API_PAGE_SIZE=2)
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='leo', first_name='Лев'
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Классика', slug='classic', description=''
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author,
+                group=cls.group if i % 2 else None,
+                text=f'Пост {i}',
+            )
+            for i in range(3)
+        ]
+        cls.comment = cls.posts[1].comments.create(
+            author=cls.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, name, *args, **params):
+        response = self.client.get(reverse(f'api:{name}', args=args), params)
+        return response.status_code, response.json()
+
+    def test_posts_pages_with_embedded_author_and_group(self):
+        """Автор и группа приходят в посте, страницы листаются курсором."""
+        with self.assertNumQueries(1):
+            status, data = self.get('post_list')
+        self.assertEqual(status, 200)
+        self.assertEqual(data['previous'], None)
+        first, second = data['results']
+        self.assertEqual(first['id'], self.posts[2].pk)
+        self.assertEqual(first['group'], None)
+        self.assertEqual(
+            first['author'],
+            {'id': self.author.pk, 'username': 'leo', 'first_name': 'Лев',
+             'last_name': ''},
+        )
+        self.assertEqual(second['group']['slug'], 'classic')
+        self.assertEqual(second['comments_count'], 1)
+        response = self.client.get(data['next'])
+        self.assertEqual(
+            [post['id'] for post in response.json()['results']],
+            [self.posts[0].pk],
+        )
+
+    def test_cursor_of_wrong_type_returns_first_page(self):
+        """Ключ курсора другого типа, чем поле страницы, — первая
+        страница, а не ошибка."""
+        cursors = {
+            'post_list': [7, self.posts[0].pk, False],
+            'group_list': ['2020-01-01T00:00:00+00:00', 1, False],
+        }
+        for name, position in cursors.items():
+            with self.subTest(name=name):
+                cursor = base64.urlsafe_b64encode(
+                    json.dumps(position).encode()
+                ).decode()
+                status, data = self.get(name, cursor=cursor)
+                self.assertEqual(status, 200)
+                self.assertIsNone(data['previous'])
+
+    def test_sparse_fieldsets_and_filters(self):
+        status, data = self.get(
+            'post_list', fields='id,author.username', group='classic'
+        )
+        self.assertEqual(
+            data['results'],
+            [{'id': self.posts[1].pk, 'author': {'username': 'leo'}}],
+        )
+        status, data = self.get('post_list', fields='id,secret')
+        self.assertEqual(status, 400)
+
+    def test_detail_and_comments(self):
+        status, data = self.get('post_detail', self.posts[1].pk, fields='text')
+        self.assertEqual(data, {'text': 'Пост 1'})
+        status, data = self.get('comment_list', self.posts[1].pk)
+        self.assertEqual(data['results'][0]['author']['username'], 'reader')
+        status, data = self.get('comment_list', 0)
+        self.assertEqual(status, 404)
+
+    def test_groups_with_stats(self):
+        status, data = self.get('group_detail', 'classic', fields='stats')
+        self.assertEqual(data['stats']['posts_day'], 1)
+        status, data = self.get('group_list', fields='slug')
+        self.assertEqual(data['results'], [{'slug': 'classic'}])
+
+    def test_group_etag_changes_with_stats_windows(self):
+        """Статистика групп сдвигается раз в час и без записей."""
+        for name, args in (('group_list', ()), ('group_detail', ('classic',))):
+            url = reverse(f'api:{name}', args=args)
+            with self.subTest(name=name):
+                etag = self.client.get(url)['ETag']
+                next_hour = conditional.activity_version() + 3600 * 10 ** 9
+                with mock.patch.object(
+                    conditional, 'activity_version', return_value=next_hour
+                ):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=etag
+                    )
+                self.assertEqual(response.status_code, 200)
+
+    def test_follows_need_login(self):
+        status, data = self.get('follow_list')
+        self.assertEqual(status, 401)
+        self.client.force_login(self.reader)
+        status, data = self.get('follow_list')
+        self.assertEqual(
+            [follow['author']['username'] for follow in data['results']],
+            ['leo'],
+        )
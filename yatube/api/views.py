@@ -0,0 +1,136 @@
+from functools import wraps
+
+from django.conf import settings
+from django.http import JsonResponse
+
+from core.routers import read_from_replica
+from posts.activity import with_stats
+from posts.conditional import (activity_etag, activity_last_modified,
+                               conditional, feed_etag, feed_last_modified,
+                               follow_etag, follow_last_modified, group_etag,
+                               group_last_modified, post_etag)
+from posts.models import Comment, Follow, Group, Post
+from posts.utils import CommentPaginator, CursorPaginator, IdPaginator
+
+from .serializers import (COMMENT_FIELDS, FOLLOW_FIELDS, GROUP_FIELDS,
+                          POST_FIELDS, row_lookups, select_fields, serialize)
+
+
+def error(status, detail):
+    return JsonResponse({'detail': detail}, status=status)
+
+
+def api_login_required(view):
+    """Как login_required, но отвечает 401 вместо перехода на вход."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return error(401, 'Нужна авторизация.')
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def page_size(request):
+    try:
+        limit = int(request.GET.get('limit', settings.API_PAGE_SIZE))
+    except ValueError:
+        limit = settings.API_PAGE_SIZE
+    return max(1, min(limit, settings.API_MAX_PAGE_SIZE))
+
+
+def page_link(request, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+
+def list_response(request, queryset, fields, paginator_class):
+    """Страница строк queryset по курсору с выбранными в ?fields= полями."""
+    try:
+        fields = select_fields(fields, request.GET.get('fields'))
+    except ValueError as exception:
+        return error(400, str(exception))
+    lookups = row_lookups(fields, 'pk', paginator_class.date_field)
+    page = paginator_class(
+        queryset.values_list(*lookups, named=True), page_size(request)
+    ).get_cursor_page(request.GET.get('cursor'))
+    return JsonResponse({
+        'results': [serialize(row, fields) for row in page],
+        'next': page_link(request, page.next_cursor),
+        'previous': page_link(request, page.previous_cursor),
+    }, json_dumps_params={'ensure_ascii': False})
+
+
+def detail_response(request, queryset, fields):
+    try:
+        fields = select_fields(fields, request.GET.get('fields'))
+    except ValueError as exception:
+        return error(400, str(exception))
+    row = queryset.values_list(*row_lookups(fields), named=True).first()
+    if row is None:
+        return error(404, 'Не найдено.')
+    return JsonResponse(
+        serialize(row, fields), json_dumps_params={'ensure_ascii': False}
+    )
+
+
+@read_from_replica
+@conditional(feed_etag, feed_last_modified)
+def post_list(request):
+    posts = Post.objects.all()
+    if request.GET.get('author'):
+        posts = posts.filter(author__username=request.GET['author'])
+    if request.GET.get('group'):
+        posts = posts.filter(group__slug=request.GET['group'])
+    return list_response(request, posts, POST_FIELDS, CursorPaginator)
+
+
+@read_from_replica
+@conditional(post_etag)
+def post_detail(request, post_id):
+    return detail_response(
+        request, Post.objects.filter(pk=post_id), POST_FIELDS
+    )
+
+
+@read_from_replica
+@conditional(post_etag)
+def comment_list(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        return error(404, 'Не найдено.')
+    return list_response(
+        request,
+        Comment.objects.filter(post_id=post_id),
+        COMMENT_FIELDS,
+        CommentPaginator,
+    )
+
+
+@read_from_replica
+@conditional(activity_etag, activity_last_modified)
+def group_list(request):
+    return list_response(
+        request, with_stats(Group.objects.all()), GROUP_FIELDS, IdPaginator
+    )
+
+
+@read_from_replica
+@conditional(group_etag, group_last_modified)
+def group_detail(request, slug):
+    return detail_response(
+        request, with_stats(Group.objects.filter(slug=slug)), GROUP_FIELDS
+    )
+
+
+@read_from_replica
+@api_login_required
+@conditional(follow_etag, follow_last_modified)
+def follow_list(request):
+    return list_response(
+        request,
+        Follow.objects.filter(user=request.user),
+        FOLLOW_FIELDS,
+        IdPaginator,
+    )
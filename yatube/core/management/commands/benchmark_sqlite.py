@@ -0,0 +1,134 @@
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.signals import apply_pragmas
+
+ROLLBACK_JOURNAL = {'journal_mode': 'DELETE', 'synchronous': 'FULL'}
+WRITE_BATCH = 20
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает чтения во время записи в SQLite с журналом отката и '
+        'с настройками SQLITE_PRAGMAS на временной базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--rows', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        modes = {
+            'журнал отката': {**settings.SQLITE_PRAGMAS, **ROLLBACK_JOURNAL},
+            'SQLITE_PRAGMAS': settings.SQLITE_PRAGMAS,
+        }
+        for name, pragmas in modes.items():
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'benchmark.sqlite3')
+                self.seed(path, pragmas, options['rows'])
+                reads, writes, errors = self.run(path, pragmas, options)
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(
+                f'  чтений: {len(reads)}, транзакций записи: {writes}, '
+                f'ошибок блокировки: {errors}'
+            )
+            if reads:
+                reads.sort()
+                self.stdout.write(
+                    f'  чтение, мс: медиана '
+                    f'{statistics.median(reads) * 1000:.2f}, '
+                    f'p99 {reads[int(len(reads) * 0.99)] * 1000:.2f}, '
+                    f'максимум {reads[-1] * 1000:.2f}'
+                )
+
+    def connect(self, path, pragmas):
+        connection = sqlite3.connect(path, isolation_level=None)
+        apply_pragmas(connection.cursor(), pragmas)
+        return connection
+
+    def seed(self, path, pragmas, rows):
+        connection = self.connect(path, pragmas)
+        connection.execute(
+            'CREATE TABLE post (id INTEGER PRIMARY KEY, pub_date REAL, '
+            'text TEXT)'
+        )
+        connection.execute('CREATE INDEX post_pub_date ON post (pub_date)')
+        connection.execute('BEGIN')
+        connection.executemany(
+            'INSERT INTO post (pub_date, text) VALUES (?, ?)',
+            ((time.time(), f'Пост {i}' * 10) for i in range(rows)),
+        )
+        connection.execute('COMMIT')
+        connection.close()
+
+    def run(self, path, pragmas, options):
+        """Читатели и писатель работают одновременно заданное время."""
+        state = {
+            'stop': threading.Event(),
+            'lock': threading.Lock(),
+            'reads': [],
+            'writes': 0,
+            'errors': 0,
+        }
+        threads = [
+            threading.Thread(target=self.write, args=(path, pragmas, state))
+        ] + [
+            threading.Thread(target=self.read, args=(path, pragmas, state))
+            for _ in range(options['readers'])
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(options['seconds'])
+        state['stop'].set()
+        for thread in threads:
+            thread.join()
+        return state['reads'], state['writes'], state['errors']
+
+    def read(self, path, pragmas, state):
+        connection = self.connect(path, pragmas)
+        latencies = []
+        errors = 0
+        while not state['stop'].is_set():
+            started = time.perf_counter()
+            try:
+                connection.execute(
+                    'SELECT id, text FROM post '
+                    'ORDER BY pub_date DESC LIMIT 10'
+                ).fetchall()
+            except sqlite3.OperationalError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+        connection.close()
+        with state['lock']:
+            state['reads'].extend(latencies)
+            state['errors'] += errors
+
+    def write(self, path, pragmas, state):
+        connection = self.connect(path, pragmas)
+        writes = errors = 0
+        while not state['stop'].is_set():
+            try:
+                connection.execute('BEGIN IMMEDIATE')
+                connection.executemany(
+                    'INSERT INTO post (pub_date, text) VALUES (?, ?)',
+                    [(time.time(), 'Новый пост')] * WRITE_BATCH,
+                )
+                connection.execute('COMMIT')
+                writes += 1
+            except sqlite3.OperationalError:
+                if connection.in_transaction:
+                    connection.execute('ROLLBACK')
+                errors += 1
+        connection.close()
+        with state['lock']:
+            state['writes'] += writes
+            state['errors'] += errors
@@ -0,0 +1,205 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.db import connections
+
+# Части запроса, время которых считается отдельно. Они могут
+# пересекаться: время шаблона включает запросы и кэш внутри шаблона.
+PARTS = ('db', 'template', 'cache', 'thumbnail')
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+# Метрики текущего запроса; None вне запроса и при выключенных метриках.
+current = ContextVar('metrics', default=None)
+
+
+class RequestMetrics:
+    """Время частей, запросы к базе и обращения к кэшу одного запроса."""
+
+    def __init__(self):
+        self.durations = dict.fromkeys(PARTS, 0.0)
+        self.queries = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def add(self, part, duration):
+        self.durations[part] += duration
+
+    def execute(self, execute, sql, params, many, context):
+        """Обёртка connection.execute_wrapper."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.add('db', time.perf_counter() - started)
+
+    def server_timing(self, total):
+        """Значение заголовка Server-Timing, длительности в мс."""
+        descriptions = {
+            'db': f'{self.queries} queries',
+            'cache': f'{self.cache_hits} hits {self.cache_misses} misses',
+        }
+        parts = []
+        for part, duration in (*self.durations.items(), ('total', total)):
+            entry = f'{part};dur={duration * 1000:.1f}'
+            if part in descriptions:
+                entry += f';desc="{descriptions[part]}"'
+            parts.append(entry)
+        return ', '.join(parts)
+
+
+@contextmanager
+def timer(part):
+    """Прибавляет время блока к части текущего запроса."""
+    state = current.get()
+    if state is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        state.add(part, time.perf_counter() - started)
+
+
+def timed(part):
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with timer(part):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def wrap_connections(wrapper):
+    """execute_wrapper на всех соединениях потока, включая реплики."""
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(wrapper))
+        yield
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            cumulative += count
+            yield f'{name}_bucket', {**labels, 'le': str(bound)}, cumulative
+        yield f'{name}_sum', labels, self.sum
+        yield f'{name}_count', labels, self.count
+
+
+class Registry:
+    """Метрики процесса в текстовом формате Prometheus.
+
+    Каждый процесс сервера копит свои значения с момента запуска.
+    """
+
+    # Имя: границы корзин и описание.
+    histograms = {
+        'yatube_request_duration_seconds': (
+            DURATION_BUCKETS, 'Время ответа view.'
+        ),
+        'yatube_request_queries': (
+            QUERY_BUCKETS, 'Запросов к базе за один ответ.'
+        ),
+    }
+    # Имя: вторая после view метка и описание.
+    counters = {
+        'yatube_requests_total': ('status', 'Ответы по кодам.'),
+        'yatube_request_part_seconds_total': (
+            'part', 'Время в базе, шаблонах, кэше и миниатюрах.'
+        ),
+        'yatube_cache_requests_total': (
+            'result', 'Чтения кэша: попадания и промахи.'
+        ),
+    }
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.values = {name: {} for name in self.histograms}
+            self.values.update(
+                {name: defaultdict(float) for name in self.counters}
+            )
+
+    def observe(self, name, view, value):
+        buckets, _ = self.histograms[name]
+        self.values[name].setdefault(view, Histogram(buckets)).observe(value)
+
+    def record(self, view, status, state, duration):
+        with self.lock:
+            self.observe('yatube_request_duration_seconds', view, duration)
+            self.observe('yatube_request_queries', view, state.queries)
+            self.values['yatube_requests_total'][view, str(status)] += 1
+            parts = self.values['yatube_request_part_seconds_total']
+            for part, value in state.durations.items():
+                parts[view, part] += value
+            cache = self.values['yatube_cache_requests_total']
+            cache[view, 'hit'] += state.cache_hits
+            cache[view, 'miss'] += state.cache_misses
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name, (_, description) in self.histograms.items():
+                lines += header(name, 'histogram', description)
+                for view, histogram in sorted(self.values[name].items()):
+                    lines += [
+                        sample(*item)
+                        for item in histogram.samples(name, {'view': view})
+                    ]
+            for name, (label, description) in self.counters.items():
+                lines += header(name, 'counter', description)
+                for (view, value), number in sorted(
+                    self.values[name].items()
+                ):
+                    lines.append(
+                        sample(name, {'view': view, label: value}, number)
+                    )
+        return '\n'.join(lines) + '\n'
+
+
+def header(name, kind, description):
+    return [f'# HELP {name} {description}', f'# TYPE {name} {kind}']
+
+
+def sample(name, labels, value):
+    labels = ','.join(
+        f'{key}="{escape(label)}"' for key, label in labels.items()
+    )
+    return f'{name}{{{labels}}} {value:g}'
+
+
+def escape(value):
+    return (
+        value.replace('\\', r'\\').replace('\n', r'\n')
+        .replace('"', r'\"')
+    )
+
+
+registry = Registry()
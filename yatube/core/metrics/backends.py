@@ -0,0 +1,104 @@
+import time
+
+from django.core.cache.backends import filebased, locmem, memcached
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.template.backends import django as django_backend
+
+from . import current, timer
+
+MISSING = object()
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        with timer('template'):
+            return super().render(context, request)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Шаблоны Django, время отрисовки которых попадает в метрики.
+
+    Считается только отрисовка целой страницы: include и extends внутри
+    шаблона идут мимо бэкенда.
+    """
+
+    def from_string(self, template_code):
+        return Template(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
+
+
+class CacheMetricsMixin:
+    """Время обращений к кэшу, попадания и промахи в метриках запроса.
+
+    Пока идёт учтённое обращение, вложенные вызовы базового класса
+    (get_many через get, get_or_set через get и add) не считаются.
+    """
+
+    def measure(self, method, *args, **kwargs):
+        """Результат метода и метрики запроса, если они включены."""
+        state = current.get()
+        if state is None:
+            return method(*args, **kwargs), None
+        token = current.set(None)
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs), state
+        finally:
+            current.reset(token)
+            state.add('cache', time.perf_counter() - started)
+
+    def get(self, key, default=None, version=None):
+        value, state = self.measure(super().get, key, MISSING, version)
+        if state is not None:
+            if value is MISSING:
+                state.cache_misses += 1
+            else:
+                state.cache_hits += 1
+        return default if value is MISSING else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        values, state = self.measure(super().get_many, keys, version)
+        if state is not None:
+            state.cache_hits += len(values)
+            state.cache_misses += len(keys) - len(values)
+        return values
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        value, state = self.measure(super().get, key, MISSING, version)
+        if value is not MISSING:
+            if state is not None:
+                state.cache_hits += 1
+            return value
+        if state is not None:
+            state.cache_misses += 1
+        value, _ = self.measure(
+            super().get_or_set, key, default, timeout, version
+        )
+        return value
+
+    def set(self, *args, **kwargs):
+        return self.measure(super().set, *args, **kwargs)[0]
+
+    def add(self, *args, **kwargs):
+        return self.measure(super().add, *args, **kwargs)[0]
+
+    def set_many(self, *args, **kwargs):
+        return self.measure(super().set_many, *args, **kwargs)[0]
+
+    def delete(self, *args, **kwargs):
+        return self.measure(super().delete, *args, **kwargs)[0]
+
+
+class LocMemCache(CacheMetricsMixin, locmem.LocMemCache):
+    pass
+
+
+class FileBasedCache(CacheMetricsMixin, filebased.FileBasedCache):
+    pass
+
+
+class MemcachedCache(CacheMetricsMixin, memcached.MemcachedCache):
+    pass
@@ -0,0 +1,89 @@
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import RequestMetrics, current, registry, wrap_connections
+from .profiling import Capture, capture_lock, requested_kinds
+from .slow_queries import SlowQueryRecorder
+
+
+class MetricsMiddleware:
+    """Время ответа, запросы к базе, шаблоны и кэш каждого view.
+
+    При выключенных METRICS_ENABLED Django убирает middleware из цепочки,
+    обёртки базы не ставятся, а бэкенды шаблонов и кэша только проверяют,
+    что метрик текущего запроса нет.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RequestMetrics()
+        token = current.set(state)
+        started = time.perf_counter()
+        try:
+            with wrap_connections(state.execute):
+                response = self.get_response(request)
+        finally:
+            current.reset(token)
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        registry.record(
+            match.view_name if match else 'unmatched',
+            response.status_code,
+            state,
+            duration,
+        )
+        if settings.METRICS_SERVER_TIMING:
+            response['Server-Timing'] = state.server_timing(duration)
+        return response
+
+
+class SlowQueryMiddleware:
+    """Пишет в журнал запросы к базе дольше SLOW_QUERY_MS миллисекунд.
+
+    При SLOW_QUERY_MS = 0 журнал выключен и middleware не подключается.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SLOW_QUERY_MS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with wrap_connections(SlowQueryRecorder(request)):
+            return self.get_response(request)
+
+
+class ProfilingMiddleware:
+    """Профилирует view по флагу ?profile= или заголовку X-Profile.
+
+    Флаг учитывается только у персонала. Замеры сохраняются в
+    PROFILE_DIR, их id приходит в заголовке X-Profile-Id.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILE_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view, args, kwargs):
+        kinds = requested_kinds(request)
+        if not kinds or not request.user.is_staff:
+            return None
+        if not capture_lock.acquire(blocking=False):
+            return None
+        try:
+            capture = Capture(kinds)
+            response = capture.run(view, request, *args, **kwargs)
+            response['X-Profile-Id'] = capture.save(request, response)
+        finally:
+            capture_lock.release()
+        return response
@@ -0,0 +1,196 @@
+import cProfile
+import json
+import os
+import pstats
+import re
+import shutil
+import threading
+import time
+import tracemalloc
+import uuid
+
+from django.conf import settings
+from django.utils import timezone
+
+KINDS = ('cpu', 'memory')
+CPU_FILE = 'cpu.prof'
+MEMORY_FILE = 'memory.snapshot'
+META_FILE = 'meta.json'
+# Время с микросекундами, чтобы id сортировались по времени, и случайный
+# хвост от совпадений между процессами.
+CAPTURE_ID_RE = re.compile(r'^\d{8}-\d{6}-\d{6}-[0-9a-f]{4}$')
+TRACEBACK_FRAMES = 10
+# tracemalloc общий на процесс: пока идёт один замер, другие запросы
+# с флагом выполняются без профилирования.
+capture_lock = threading.Lock()
+
+
+def requested_kinds(request):
+    """Виды замера из ?profile= или заголовка X-Profile: cpu, memory, all."""
+    value = request.GET.get(settings.PROFILE_PARAMETER) or request.META.get(
+        'HTTP_X_PROFILE', ''
+    )
+    kinds = {kind.strip() for kind in value.lower().split(',')}
+    if kinds & {'1', 'all'}:
+        return KINDS
+    return tuple(kind for kind in KINDS if kind in kinds)
+
+
+class Capture:
+    """Профиль и снимок памяти одного вызова."""
+
+    def __init__(self, kinds):
+        self.kinds = kinds
+        self.profiler = cProfile.Profile() if 'cpu' in kinds else None
+        self.snapshot = None
+        self.peak = None
+        self.duration = None
+
+    def run(self, function, *args, **kwargs):
+        memory = 'memory' in self.kinds
+        # Если трассировку включил PYTHONTRACEMALLOC, её не выключаем.
+        tracing = tracemalloc.is_tracing()
+        if memory and not tracing:
+            tracemalloc.start(TRACEBACK_FRAMES)
+        elif memory:
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        try:
+            if self.profiler is not None:
+                self.profiler.enable()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                if self.profiler is not None:
+                    self.profiler.disable()
+                self.duration = time.perf_counter() - started
+                if memory:
+                    self.snapshot = tracemalloc.take_snapshot()
+                    self.peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            if memory and not tracing:
+                tracemalloc.stop()
+
+    def save(self, request, response):
+        """Сохраняет файлы замера и сведения о запросе, возвращает id."""
+        now = timezone.now()
+        capture_id = f'{now:%Y%m%d-%H%M%S-%f}-{uuid.uuid4().hex[:4]}'
+        directory = os.path.join(settings.PROFILE_DIR, capture_id)
+        os.makedirs(directory)
+        if self.profiler is not None:
+            self.profiler.dump_stats(os.path.join(directory, CPU_FILE))
+        if self.snapshot is not None:
+            self.snapshot.dump(os.path.join(directory, MEMORY_FILE))
+        match = request.resolver_match
+        meta = {
+            'id': capture_id,
+            'created': now.isoformat(),
+            'method': request.method,
+            'path': request.get_full_path(),
+            'view': match.view_name if match else None,
+            'user': request.user.get_username(),
+            'status': response.status_code,
+            'kinds': list(self.kinds),
+            'duration_ms': round(self.duration * 1000, 2),
+            'peak_kb': self.peak and round(self.peak / 1024, 1),
+        }
+        with open(
+            os.path.join(directory, META_FILE), 'w', encoding='utf-8'
+        ) as file:
+            json.dump(meta, file, ensure_ascii=False)
+        prune()
+        return capture_id
+
+
+def capture_ids():
+    """Id сохранённых замеров, новые первыми."""
+    if not os.path.isdir(settings.PROFILE_DIR):
+        return []
+    return sorted(
+        (name for name in os.listdir(settings.PROFILE_DIR)
+         if CAPTURE_ID_RE.match(name)),
+        reverse=True,
+    )
+
+
+def prune():
+    """Удаляет замеры сверх PROFILE_KEEP, начиная со старых."""
+    for capture_id in capture_ids()[settings.PROFILE_KEEP:]:
+        shutil.rmtree(
+            os.path.join(settings.PROFILE_DIR, capture_id),
+            ignore_errors=True,
+        )
+
+
+def capture_path(capture_id, name):
+    """Путь к файлу замера; None для чужого id или отсутствующего файла."""
+    if not CAPTURE_ID_RE.match(capture_id):
+        return None
+    path = os.path.join(settings.PROFILE_DIR, capture_id, name)
+    return path if os.path.exists(path) else None
+
+
+def load_meta(capture_id):
+    path = capture_path(capture_id, META_FILE)
+    if path is None:
+        return None
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def captures():
+    return [
+        meta for meta in map(load_meta, capture_ids()) if meta is not None
+    ]
+
+
+def short_path(filename):
+    """Путь относительно проекта или пакета в site-packages."""
+    if filename.startswith(settings.BASE_DIR):
+        return os.path.relpath(filename, settings.BASE_DIR)
+    _, found, package_path = filename.partition('site-packages' + os.sep)
+    return package_path if found else filename
+
+
+def hot_functions(capture_id, limit):
+    """Функции с наибольшим временем вместе с вызванными."""
+    path = capture_path(capture_id, CPU_FILE)
+    if path is None:
+        return []
+    stats = pstats.Stats(path)
+    stats.sort_stats('cumulative')
+    rows = []
+    for function in stats.fcn_list[:limit]:
+        primitive, calls, own, total, _ = stats.stats[function]
+        filename, line, name = function
+        rows.append({
+            'function': name,
+            'location': f'{short_path(filename)}:{line}',
+            'calls': calls,
+            'primitive_calls': primitive,
+            'own_ms': own * 1000,
+            'total_ms': total * 1000,
+        })
+    return rows
+
+
+def allocation_sites(capture_id, limit):
+    """Строки кода, выделившие больше всего ещё живой памяти."""
+    path = capture_path(capture_id, MEMORY_FILE)
+    if path is None:
+        return []
+    snapshot = tracemalloc.Snapshot.load(path).filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+    ))
+    return [
+        {
+            'location': (
+                f'{short_path(statistic.traceback[0].filename)}:'
+                f'{statistic.traceback[0].lineno}'
+            ),
+            'size_kb': statistic.size / 1024,
+            'count': statistic.count,
+        }
+        for statistic in snapshot.statistics('lineno')[:limit]
+    ]
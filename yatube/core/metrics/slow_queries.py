@@ -0,0 +1,192 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import traceback
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+
+EXPLAINABLE = ('SELECT', 'WITH')
+# Списки значений в IN (...) и строки VALUES (...) сворачиваются, чтобы
+# запросы с разной длиной списка получили один отпечаток.
+LISTS_RE = re.compile(r'\?(?:\s*,\s*\?)+')
+ROWS_RE = re.compile(r'\(\?\)(?:\s*,\s*\(\?\))+')
+LITERALS_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+SPACES_RE = re.compile(r'\s+')
+
+handlers = {}
+handlers_lock = threading.Lock()
+
+
+def explain(connection, sql, params):
+    """Строки плана выполнения запроса."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+        cursor.execute('EXPLAIN ' + sql, params)
+        return [' '.join(map(str, row)) for row in cursor.fetchall()]
+
+
+def fingerprint(sql):
+    """Запрос без значений: одинаковый у запросов одного места кода."""
+    normalized = LITERALS_RE.sub('?', sql.replace('%s', '?'))
+    normalized = ROWS_RE.sub('(?)', LISTS_RE.sub('?', normalized))
+    normalized = SPACES_RE.sub(' ', normalized).strip()
+    return hashlib.md5(normalized.encode()).hexdigest()[:12], normalized
+
+
+def logged_params(sql, params, many):
+    """Параметры для журнала; None, если их писать нельзя."""
+    if many or not settings.SLOW_QUERY_PARAMS:
+        return None
+    if any(
+        f'"{table}"' in sql or f' {table} ' in sql
+        for table in settings.SLOW_QUERY_PRIVATE_TABLES
+    ):
+        return None
+    return params
+
+
+def caller():
+    """Ближайшая к запросу строка кода проекта."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    for frame in reversed(traceback.extract_stack()):
+        filename = os.path.abspath(frame.filename)
+        if (
+            filename.startswith(settings.BASE_DIR)
+            and not filename.startswith(here)
+            and 'site-packages' not in filename
+        ):
+            return {
+                'file': os.path.relpath(filename, settings.BASE_DIR),
+                'line': frame.lineno,
+                'function': frame.name,
+                'code': frame.line,
+            }
+    return None
+
+
+def log_handler(path):
+    with handlers_lock:
+        if path not in handlers:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            handlers[path] = RotatingFileHandler(
+                path,
+                maxBytes=settings.SLOW_QUERY_LOG_BYTES,
+                backupCount=settings.SLOW_QUERY_LOG_BACKUPS,
+                encoding='utf-8',
+            )
+        return handlers[path]
+
+
+def write(entry):
+    """Строка JSONL в журнал; файл ротируется по размеру."""
+    log_handler(settings.SLOW_QUERY_LOG).handle(logging.makeLogRecord({
+        'msg': json.dumps(entry, ensure_ascii=False, default=str),
+    }))
+
+
+class SlowQueryRecorder:
+    """Обёртка execute, которая пишет в журнал запросы дольше порога.
+
+    Для SELECT сразу снимается план: к моменту разбора данные и
+    статистика базы могут измениться.
+    """
+
+    def __init__(self, request=None):
+        self.request = request
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = (time.perf_counter() - started) * 1000
+        if duration >= settings.SLOW_QUERY_MS and not sql.startswith(
+            'EXPLAIN'
+        ):
+            self.record(sql, params, many, context['connection'], duration)
+        return result
+
+    def record(self, sql, params, many, connection, duration):
+        key, normalized = fingerprint(sql)
+        plan = None
+        if not many and sql.lstrip().upper().startswith(EXPLAINABLE):
+            try:
+                plan = explain(connection, sql, params)
+            except DatabaseError as error:
+                plan = [f'EXPLAIN не выполнен: {error}']
+        entry = {
+            'time': timezone.now().isoformat(),
+            'duration_ms': round(duration, 2),
+            'fingerprint': key,
+            'normalized': normalized,
+            'sql': sql,
+            'params': logged_params(sql, params, many),
+            'database': connection.alias,
+            'view': None,
+            'path': None,
+            'frame': caller(),
+            'plan': plan,
+        }
+        if self.request is not None:
+            match = self.request.resolver_match
+            entry['view'] = match.view_name if match else None
+            entry['path'] = self.request.get_full_path()
+        write(entry)
+
+
+def read_log(path=None):
+    """Записи журнала и его ротированных копий, от старых к новым."""
+    path = path or settings.SLOW_QUERY_LOG
+    paths = [
+        f'{path}.{number}'
+        for number in range(settings.SLOW_QUERY_LOG_BACKUPS, 0, -1)
+    ] + [path]
+    for name in paths:
+        if not os.path.exists(name):
+            continue
+        with open(name, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Строка, оборванная при ротации или остановке.
+                    continue
+
+
+def worst_offenders(entries, limit=50):
+    """Отпечатки запросов по суммарному времени, самые дорогие первыми.
+
+    У каждого — число, сумма, среднее и максимум времени, views, где
+    запрос встречался, и запись о самом долгом выполнении с планом.
+    """
+    groups = {}
+    for entry in entries:
+        group = groups.setdefault(entry['fingerprint'], {
+            'fingerprint': entry['fingerprint'],
+            'normalized': entry['normalized'],
+            'count': 0,
+            'total_ms': 0,
+            'views': set(),
+            'slowest': entry,
+            'last_seen': entry['time'],
+        })
+        group['count'] += 1
+        group['total_ms'] += entry['duration_ms']
+        if entry['view']:
+            group['views'].add(entry['view'])
+        if entry['duration_ms'] > group['slowest']['duration_ms']:
+            group['slowest'] = entry
+        group['last_seen'] = max(group['last_seen'], entry['time'])
+    for group in groups.values():
+        group['mean_ms'] = group['total_ms'] / group['count']
+        group['views'] = sorted(group['views'])
+    return sorted(
+        groups.values(), key=lambda group: group['total_ms'], reverse=True
+    )[:limit]
@@ -0,0 +1,83 @@
+import hmac
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import FileResponse, Http404, HttpResponse
+from django.shortcuts import render
+
+from . import profiling, registry
+from .slow_queries import read_log, worst_offenders
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def metrics(request):
+    """Метрики процесса для Prometheus по токену из настроек.
+
+    Адрес клиента не проверяется: за прокси на той же машине он всегда
+    127.0.0.1. Без METRICS_TOKEN адрес закрыт.
+    """
+    scheme, _, token = request.META.get(
+        'HTTP_AUTHORIZATION', ''
+    ).partition(' ')
+    if (
+        not settings.METRICS_ENABLED
+        or not settings.METRICS_TOKEN
+        or scheme.lower() != 'bearer'
+        or not hmac.compare_digest(token, settings.METRICS_TOKEN)
+    ):
+        raise Http404
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
+
+
+@staff_member_required
+def slow_queries(request):
+    """Самые дорогие по суммарному времени запросы из журнала."""
+    return render(request, 'core/slow_queries.html', {
+        **admin.site.each_context(request),
+        'title': 'Медленные запросы',
+        'offenders': worst_offenders(read_log()),
+        'threshold': settings.SLOW_QUERY_MS,
+    })
+
+
+@staff_member_required
+def profiles(request):
+    """Сохранённые замеры запросов, новые первыми."""
+    return render(request, 'core/profiles.html', {
+        **admin.site.each_context(request),
+        'title': 'Профили запросов',
+        'captures': profiling.captures(),
+        'parameter': settings.PROFILE_PARAMETER,
+    })
+
+
+@staff_member_required
+def profile_detail(request, capture_id):
+    """Самые дорогие функции и места выделения памяти одного замера."""
+    meta = profiling.load_meta(capture_id)
+    if meta is None:
+        raise Http404
+    return render(request, 'core/profile_detail.html', {
+        **admin.site.each_context(request),
+        'title': f'{meta["method"]} {meta["path"]}',
+        'meta': meta,
+        'functions': profiling.hot_functions(
+            capture_id, settings.PROFILE_TOP
+        ),
+        'allocations': profiling.allocation_sites(
+            capture_id, settings.PROFILE_TOP
+        ),
+    })
+
+
+@staff_member_required
+def profile_download(request, capture_id):
+    """Файл .prof для snakeviz или pstats."""
+    path = profiling.capture_path(capture_id, profiling.CPU_FILE)
+    if path is None:
+        raise Http404
+    return FileResponse(
+        open(path, 'rb'), as_attachment=True, filename=f'{capture_id}.prof'
+    )
@@ -0,0 +1,81 @@
+import random
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+STICKY_COOKIE = 'use_primary'
+
+replica_reads = ContextVar('replica_reads', default=False)
+
+
+class ReplicaRouter:
+    """Чтения из views с read_from_replica идут на реплики, остальное —
+    на основную базу."""
+
+    def db_for_read(self, model, **hints):
+        if replica_reads.get() and settings.REPLICA_DATABASES:
+            return random.choice(list(settings.REPLICA_DATABASES))
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы, объекты из них взаимозаменяемы.
+        return True
+
+
+def read_from_replica(view):
+    """Разрешает view читать с реплик, если пользователь недавно не писал."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (
+            request.method not in SAFE_METHODS
+            or STICKY_COOKIE in request.COOKIES
+        ):
+            return view(request, *args, **kwargs)
+        token = replica_reads.set(True)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            replica_reads.reset(token)
+    return wrapper
+
+
+def writes_on_get(view):
+    """Помечает view, которое пишет в базу и по GET-запросу."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        request.wrote_to_primary = True
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+class PrimaryStickinessMiddleware:
+    """После записи пользователь какое-то время читает с основной базы,
+    чтобы видеть свои изменения, пока реплики их не догнали."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            settings.REPLICA_DATABASES
+            and (
+                request.method not in SAFE_METHODS
+                or getattr(request, 'wrote_to_primary', False)
+            )
+            and response.status_code < 400
+        ):
+            response.set_cookie(
+                STICKY_COOKIE,
+                '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,14 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite, в котором транзакция сразу берёт блокировку записи.
+
+    После обычного BEGIN транзакция сначала читает, и если за это время
+    базу изменил другой процесс, первая запись сразу падает с «database
+    is locked»: busy_timeout такую ошибку не ждёт. BEGIN IMMEDIATE ждёт
+    блокировку в начале транзакции, пока пишет другой.
+    """
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -1,4 +1,30 @@
-from django.test import TestCase
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.http import HttpResponse
+from django.test import (Client, RequestFactory, TestCase,
+                         TransactionTestCase, override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post
+
+from .metrics import profiling, registry
+from .metrics.slow_queries import (fingerprint, logged_params, read_log,
+                                   worst_offenders, write)
+from .routers import (STICKY_COOKIE, ReplicaRouter, read_from_replica,
+                      replica_reads)
+
+User = get_user_model()
+REPLICAS = {'replica1': {}, 'replica2': {}}
 
 
 class ViewTestClass(TestCase):
@@ -6,3 +32,397 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, 404)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+@override_settings(REPLICA_DATABASES=REPLICAS)
+class ReplicaRouterTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.router = ReplicaRouter()
+        cls.factory = RequestFactory()
+
+        @read_from_replica
+        def view(request):
+            return HttpResponse(str(cls.router.db_for_read(Post)))
+
+        cls.view = staticmethod(view)
+
+    def test_reads_from_replica_only_inside_view(self):
+        """Реплики используются только во views с read_from_replica."""
+        self.assertEqual(self.router.db_for_read(Post), DEFAULT_DB_ALIAS)
+        response = self.view(self.factory.get('/'))
+        self.assertIn(response.content.decode(), REPLICAS)
+        self.assertFalse(replica_reads.get())
+        self.assertEqual(self.router.db_for_write(Post), DEFAULT_DB_ALIAS)
+
+    def test_writes_and_sticky_users_read_primary(self):
+        """POST и недавно писавший пользователь читают основную базу."""
+        requests = {
+            'post': self.factory.post('/'),
+            'sticky': self.factory.get('/', HTTP_COOKIE=f'{STICKY_COOKIE}=1'),
+        }
+        for name, request in requests.items():
+            with self.subTest(name=name):
+                response = self.view(request)
+                self.assertEqual(response.content.decode(), DEFAULT_DB_ALIAS)
+
+    @override_settings(REPLICA_DATABASES={DEFAULT_DB_ALIAS: {}})
+    def test_write_sets_sticky_cookie(self):
+        """После записи ставится кука, которая ведёт чтения на основную."""
+        user = User.objects.create_user(username='auth')
+        self.client.force_login(user)
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': 'Пост'}
+        )
+        self.assertEqual(response.cookies[STICKY_COOKIE]['max-age'], 10)
+
+    @override_settings(REPLICA_DATABASES={DEFAULT_DB_ALIAS: {}})
+    def test_follow_by_get_sets_sticky_cookie(self):
+        """Подписка по ссылке тоже ведёт чтения на основную базу."""
+        user = User.objects.create_user(username='auth')
+        author = User.objects.create_user(username='author')
+        self.client.force_login(user)
+        response = self.client.get(
+            reverse('posts:profile_follow', args=[author.username])
+        )
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+
+class FileReplicaTest(TransactionTestCase):
+    """Реплика — отстающая копия основной базы в отдельном файле."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp()
+        connections.databases['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(cls.directory, 'replica.sqlite3'),
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.databases['replica']
+        shutil.rmtree(cls.directory, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+
+    def sync_replica(self):
+        """Копирует основную базу в файл реплики."""
+        connection.ensure_connection()
+        replica = sqlite3.connect(connections.databases['replica']['NAME'])
+        try:
+            connection.connection.backup(replica)
+        finally:
+            replica.close()
+
+    def test_feed_reads_replica_until_user_writes(self):
+        """Лента читается с реплики, а после записи — с основной базы."""
+        user = User.objects.create_user(username='auth')
+        Post.objects.create(author=user, text='Пост на реплике')
+        client = Client()
+        client.force_login(user)
+        self.sync_replica()
+        Post.objects.create(author=user, text='Пост только в основной')
+        replicas = {'replica': connections.databases['replica']}
+        with self.settings(REPLICA_DATABASES=replicas):
+            response = client.get(reverse('posts:index'))
+            self.assertContains(response, 'Пост на реплике')
+            self.assertNotContains(response, 'Пост только в основной')
+            client.post(reverse('posts:post_create'), {'text': 'Новый пост'})
+            response = client.get(reverse('posts:index'))
+        self.assertContains(response, 'Новый пост')
+        self.assertContains(response, 'Пост только в основной')
+
+
+class SqlitePragmasTest(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_connection_configured(self):
+        """Соединение получает настройки из SQLITE_PRAGMAS."""
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('cache_size'), -64 * 1024)
+
+    def test_benchmark_compares_journal_modes(self):
+        out = StringIO()
+        call_command(
+            'benchmark_sqlite', seconds=0.2, readers=1, rows=100, stdout=out
+        )
+        self.assertIn('журнал отката', out.getvalue())
+        self.assertIn('SQLITE_PRAGMAS', out.getvalue())
+
+
+class ImmediateTransactionTest(TransactionTestCase):
+    def test_transaction_takes_write_lock(self):
+        """Транзакция сразу берёт блокировку записи."""
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                User.objects.exists()
+        self.assertEqual(queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+
+@override_settings(
+    METRICS_ENABLED=True, METRICS_SERVER_TIMING=True, METRICS_TOKEN='secret'
+)
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        registry.reset()
+        caches['fragments'].clear()
+
+    def test_server_timing_header(self):
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        self.assertEqual(
+            re.findall(r'(\w+);dur=[\d.]+', response['Server-Timing']),
+            ['db', 'template', 'cache', 'thumbnail', 'total'],
+        )
+        self.assertRegex(response['Server-Timing'], r'desc="\d+ queries"')
+
+    def test_metrics_endpoint(self):
+        """Гистограммы времени и запросов, кэш и коды по каждому view."""
+        for _ in range(2):
+            self.client.get(reverse('posts:index'))
+        self.client.get('/nonexist-page/')
+        text = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret'
+        ).content.decode()
+        self.assertIn('# TYPE yatube_request_duration_seconds histogram', text)
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 2',
+            text,
+        )
+        self.assertIn(
+            'yatube_request_queries_bucket{view="posts:index",le="+Inf"} 2',
+            text,
+        )
+        self.assertIn(
+            'yatube_requests_total{view="unmatched",status="404"} 1', text
+        )
+        self.assertIn(
+            'yatube_request_part_seconds_total{view="posts:index",'
+            'part="template"}',
+            text,
+        )
+        # Второй показ главной берёт страницу из кэша фрагментов.
+        self.assertRegex(
+            text,
+            r'yatube_cache_requests_total\{view="posts:index",result="hit"\}'
+            r' [1-9]',
+        )
+
+    def test_metrics_need_token(self):
+        """Без верного токена метрики не отдаются и с localhost."""
+        for header in ({}, {'HTTP_AUTHORIZATION': 'Bearer wrong'}):
+            with self.subTest(header=header):
+                response = self.client.get(
+                    reverse('metrics'), REMOTE_ADDR='127.0.0.1', **header
+                )
+                self.assertEqual(response.status_code, 404)
+        with self.settings(METRICS_TOKEN=''):
+            response = self.client.get(
+                reverse('metrics'), HTTP_AUTHORIZATION='Bearer '
+            )
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        """Выключенные метрики ничего не копят и не отдают."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+        self.assertEqual(registry.values['yatube_requests_total'], {})
+
+
+LOG_DIRECTORY = tempfile.mkdtemp()
+
+
+@override_settings(
+    SLOW_QUERY_MS=0.000001,
+    SLOW_QUERY_LOG=os.path.join(LOG_DIRECTORY, 'slow.jsonl'),
+)
+class SlowQueryLogTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        Post.objects.create(author=cls.author, text='Пост')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(LOG_DIRECTORY, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        open(os.path.join(LOG_DIRECTORY, 'slow.jsonl'), 'w').close()
+
+    def test_fingerprint_ignores_values(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s) AND a = 1'),
+            fingerprint('SELECT  *  FROM t WHERE id IN (%s) AND a = 22'),
+        )
+
+    def test_records_view_frame_and_plan(self):
+        """Запрос пишется с view, строкой кода проекта и планом."""
+        for _ in range(2):
+            self.client.get(reverse('posts:profile', args=['author']))
+        entries = [
+            entry for entry in read_log()
+            if entry['view'] == 'posts:profile'
+            and 'posts_post' in entry['sql']
+        ]
+        self.assertTrue(entries)
+        entry = entries[0]
+        self.assertTrue(
+            entry['frame']['file'].startswith(('posts', 'templates'))
+        )
+        self.assertTrue(entry['plan'])
+        self.assertEqual(entry['path'], '/profile/author/')
+        offenders = worst_offenders(read_log())
+        self.assertEqual(
+            sum(offender['count'] for offender in offenders),
+            len(list(read_log())),
+        )
+        self.assertTrue(any(offender['count'] >= 2 for offender in offenders))
+
+    def test_params_are_opt_in_and_skip_private_tables(self):
+        """Параметры пишутся по настройке и никогда для сессий и
+        пользователей."""
+        self.client.get(reverse('posts:profile', args=['author']))
+        self.assertTrue(all(
+            entry['params'] is None for entry in read_log()
+        ))
+        open(os.path.join(LOG_DIRECTORY, 'slow.jsonl'), 'w').close()
+        self.client.force_login(self.staff)
+        with self.settings(SLOW_QUERY_PARAMS=True):
+            self.client.get(reverse('posts:profile', args=['author']))
+            private = [
+                entry for entry in read_log()
+                if '"auth_user"' in entry['sql']
+                or '"django_session"' in entry['sql']
+            ]
+            self.assertTrue(private)
+            self.assertTrue(all(entry['params'] is None for entry in private))
+            self.assertEqual(logged_params(
+                'SELECT * FROM "posts_group" WHERE "id" = %s', [1], False
+            ), [1])
+
+    @override_settings(SLOW_QUERY_LOG_BYTES=300, SLOW_QUERY_LOG_BACKUPS=2)
+    def test_log_rotates(self):
+        path = os.path.join(LOG_DIRECTORY, 'rotating.jsonl')
+        with self.settings(SLOW_QUERY_LOG=path):
+            for number in range(10):
+                write({'number': number, 'text': 'x' * 100})
+            numbers = [entry['number'] for entry in read_log()]
+        self.assertTrue(os.path.exists(path + '.2'))
+        self.assertEqual(numbers, sorted(numbers))
+        self.assertEqual(numbers[-1], 9)
+        self.assertLess(len(numbers), 10)
+
+    def test_summary_page_for_staff(self):
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('slow_queries'))
+        self.assertEqual(response.status_code, 302)
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('slow_queries'))
+        self.assertContains(response, 'posts:index')
+        self.assertContains(response, 'FROM')
+
+
+PROFILE_DIRECTORY = tempfile.mkdtemp()
+
+
+@override_settings(PROFILE_DIR=PROFILE_DIRECTORY)
+class ProfilingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        cls.url = reverse('posts:post_detail', args=[cls.post.pk])
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(PROFILE_DIRECTORY, ignore_errors=True)
+
+    def setUp(self):
+        shutil.rmtree(PROFILE_DIRECTORY, ignore_errors=True)
+
+    def test_only_staff_can_profile(self):
+        self.client.force_login(self.author)
+        response = self.client.get(self.url, {'profile': 'all'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('X-Profile-Id'))
+        self.assertEqual(profiling.captures(), [])
+
+    def test_capture_cpu_and_memory(self):
+        """Замер сохраняется и показывает функции и места выделения."""
+        self.client.force_login(self.staff)
+        response = self.client.get(self.url, {'profile': 'all'})
+        capture_id = response['X-Profile-Id']
+        meta, = profiling.captures()
+        self.assertEqual(meta['id'], capture_id)
+        self.assertEqual(meta['view'], 'posts:post_detail')
+        self.assertEqual(meta['kinds'], ['cpu', 'memory'])
+        self.assertGreater(meta['peak_kb'], 0)
+        functions = profiling.hot_functions(capture_id, 50)
+        self.assertIn('post_detail', [row['function'] for row in functions])
+        self.assertTrue(profiling.allocation_sites(capture_id, 10))
+        response = self.client.get(
+            reverse('profile_detail', args=[capture_id])
+        )
+        self.assertContains(response, 'posts/views.py')
+        self.assertContains(response, 'Места выделения памяти')
+        response = self.client.get(
+            reverse('profile_download', args=[capture_id])
+        )
+        self.assertIn('attachment', response['Content-Disposition'])
+        self.assertContains(
+            self.client.get(reverse('profiles')), 'posts:post_detail'
+        )
+
+    def test_header_selects_kind(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(self.url, HTTP_X_PROFILE='cpu')
+        capture_id = response['X-Profile-Id']
+        self.assertEqual(profiling.load_meta(capture_id)['peak_kb'], None)
+        self.assertEqual(profiling.allocation_sites(capture_id, 10), [])
+
+    @override_settings(PROFILE_KEEP=2)
+    def test_old_captures_pruned(self):
+        self.client.force_login(self.staff)
+        ids = [
+            self.client.get(self.url, {'profile': 'cpu'})['X-Profile-Id']
+            for _ in range(3)
+        ]
+        self.assertEqual(
+            {meta['id'] for meta in profiling.captures()}, set(ids[1:])
+        )
+
+    def test_unknown_capture(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(
+            reverse('profile_detail', args=['..'])
+        )
+        self.assertEqual(response.status_code, 404)
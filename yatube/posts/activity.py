@@ -0,0 +1,213 @@
+from collections import Counter
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.db.models import (Case, Count, F, IntegerField, Max, OuterRef,
+                              Subquery, Sum, Value, When)
+from django.db.models.functions import Coalesce, Greatest, TruncHour
+from django.utils import timezone
+
+from .models import Comment, Group, GroupActivity, GroupAuthor, Post
+
+HOUR = timedelta(hours=1)
+WINDOWS = {'hour': HOUR, 'day': timedelta(days=1), 'week': timedelta(weeks=1)}
+# Новый пост поднимает группу в популярных как три комментария.
+POST_WEIGHT = 3
+TRENDING_LIMIT = 10
+
+
+def hour_bucket(moment):
+    """Начало часа (UTC), к которому относится момент."""
+    return moment.astimezone(dt_timezone.utc).replace(
+        minute=0, second=0, microsecond=0
+    )
+
+
+def activity_version():
+    """Меняется раз в час: окна статистики сдвигаются и без записей."""
+    return int(hour_bucket(timezone.now()).timestamp()) * 10 ** 9
+
+
+def window_start(window, now=None):
+    """Первый час окна; текущий час входит в окно."""
+    return hour_bucket(now or timezone.now()) - WINDOWS[window] + HOUR
+
+
+def upsert(model, lookup, update, create):
+    """Обновляет строку или создаёт её, если строки ещё нет."""
+    if model.objects.filter(**lookup).update(**update):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **create)
+    except IntegrityError:
+        # Строку успели создать в параллельном запросе.
+        model.objects.filter(**lookup).update(**update)
+
+
+def change_activity(group_id, moment, **deltas):
+    """Сдвигает счётчики группы в часе, к которому относится момент."""
+    lookup = {'group_id': group_id, 'bucket': hour_bucket(moment)}
+    update = {field: F(field) + delta for field, delta in deltas.items()}
+    if any(delta < 0 for delta in deltas.values()):
+        GroupActivity.objects.filter(**lookup).update(**update)
+        return
+    upsert(GroupActivity, lookup, update, deltas)
+
+
+def touch_author(group_id, author_id, moment):
+    """Запоминает пост автора в группе; более ранний пост (например,
+    из импорта) дату не сдвигает."""
+    upsert(
+        GroupAuthor,
+        {'group_id': group_id, 'author_id': author_id},
+        {'last_posted': Greatest('last_posted', moment)},
+        {'last_posted': moment},
+    )
+
+
+def record_posts(posts):
+    """Учитывает новые посты в статистике их групп."""
+    posts = [post for post in posts if post.group_id]
+    buckets = Counter(
+        (post.group_id, hour_bucket(post.pub_date)) for post in posts
+    )
+    for (group_id, bucket), count in buckets.items():
+        change_activity(group_id, bucket, posts_count=count)
+    authors = {}
+    for post in posts:
+        key = (post.group_id, post.author_id)
+        authors[key] = max(authors.get(key, post.pub_date), post.pub_date)
+    for (group_id, author_id), moment in authors.items():
+        touch_author(group_id, author_id, moment)
+
+
+def comment_buckets(post_id):
+    """Число комментариев поста по часам."""
+    return dict(
+        Comment.objects.filter(post_id=post_id).annotate(
+            bucket=TruncHour('created', tzinfo=dt_timezone.utc)
+        ).order_by().values_list('bucket').annotate(count=Count('pk'))
+    )
+
+
+def remove_comments(group_id, buckets):
+    """Вычитает комментарии из часов группы одним UPDATE."""
+    if not buckets:
+        return
+    GroupActivity.objects.filter(
+        group_id=group_id, bucket__in=buckets
+    ).update(comments_count=F('comments_count') - Case(
+        *(When(bucket=bucket, then=Value(count))
+          for bucket, count in buckets.items()),
+        output_field=IntegerField(),
+    ))
+
+
+def refresh_author(group_id, author_id):
+    """Дата последнего поста автора в группе после того, как пост ушёл."""
+    last_posted = Post.objects.filter(
+        group_id=group_id, author_id=author_id
+    ).aggregate(last=Max('pub_date'))['last']
+    authors = GroupAuthor.objects.filter(
+        group_id=group_id, author_id=author_id
+    )
+    if last_posted is None:
+        authors.delete()
+    else:
+        authors.update(last_posted=last_posted)
+
+
+def move_post(post, old_group_id):
+    """Переносит пост и его комментарии в статистику новой группы."""
+    buckets = comment_buckets(post.pk)
+    if old_group_id:
+        change_activity(old_group_id, post.pub_date, posts_count=-1)
+        remove_comments(old_group_id, buckets)
+        refresh_author(old_group_id, post.author_id)
+    if post.group_id:
+        change_activity(post.group_id, post.pub_date, posts_count=1)
+        for bucket, count in buckets.items():
+            change_activity(post.group_id, bucket, comments_count=count)
+        touch_author(post.group_id, post.author_id, post.pub_date)
+
+
+def with_stats(groups, now=None):
+    """Добавляет группам статистику за час, день и неделю.
+
+    Каждое значение — подзапрос по часовым строкам группы, так что
+    стоимость зависит от числа групп, а не от числа постов.
+    """
+    now = now or timezone.now()
+    stats = {}
+    for window in WINDOWS:
+        since = window_start(window, now)
+        activity = GroupActivity.objects.filter(
+            group=OuterRef('pk'), bucket__gte=since
+        ).order_by().values('group')
+        authors = GroupAuthor.objects.filter(
+            group=OuterRef('pk'), last_posted__gte=since
+        ).order_by().values('group')
+        stats[f'posts_{window}'] = subquery(
+            activity.annotate(total=Sum('posts_count'))
+        )
+        stats[f'comments_{window}'] = subquery(
+            activity.annotate(total=Sum('comments_count'))
+        )
+        stats[f'authors_{window}'] = subquery(
+            authors.annotate(total=Count('pk'))
+        )
+    return groups.annotate(**stats)
+
+
+def subquery(queryset):
+    return Coalesce(
+        Subquery(queryset.values('total'), output_field=IntegerField()), 0
+    )
+
+
+def trending_groups(limit=TRENDING_LIMIT):
+    """Группы с самой большой активностью за последние сутки."""
+    return with_stats(Group.objects.all()).annotate(
+        score=F('posts_day') * POST_WEIGHT + F('comments_day')
+    ).filter(score__gt=0).order_by('-score', 'title')[:limit]
+
+
+def recount_group_activity():
+    """Пересобирает статистику групп за последнюю неделю из постов и
+    комментариев и удаляет устаревшие часы."""
+    since = window_start('week')
+    GroupActivity.objects.all().delete()
+    GroupAuthor.objects.all().delete()
+    rows = {}
+    counted = (
+        (Post.objects.filter(pub_date__gte=since, group__isnull=False),
+         'group', 'pub_date', 'posts_count'),
+        (Comment.objects.filter(created__gte=since, post__group__isnull=False),
+         'post__group', 'created', 'comments_count'),
+    )
+    for queryset, group, date, field in counted:
+        counts = queryset.annotate(
+            bucket=TruncHour(date, tzinfo=dt_timezone.utc)
+        ).order_by().values_list(group, 'bucket').annotate(count=Count('pk'))
+        for group_id, bucket, count in counts:
+            row = rows.setdefault(
+                (group_id, bucket),
+                GroupActivity(group_id=group_id, bucket=bucket),
+            )
+            setattr(row, field, count)
+    GroupActivity.objects.bulk_create(rows.values(), batch_size=500)
+    authors = Post.objects.filter(
+        pub_date__gte=since, group__isnull=False
+    ).order_by().values_list('group', 'author').annotate(
+        last_posted=Max('pub_date')
+    )
+    GroupAuthor.objects.bulk_create(
+        (
+            GroupAuthor(group_id=group_id, author_id=author_id,
+                        last_posted=last_posted)
+            for group_id, author_id, last_posted in authors.iterator()
+        ),
+        batch_size=500,
+    )
+    return len(rows)
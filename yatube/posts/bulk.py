@@ -0,0 +1,81 @@
+from collections import Counter
+
+from django.db import connection, transaction
+from django.db.models import Case, Value, When
+from django.utils import timezone
+
+from . import activity, counters, fragments, ranking, search, timeline
+from .models import Post
+
+# Постов в одном UPDATE с CASE: по два параметра на пост и id в IN,
+# старые SQLite принимают не больше 999 параметров.
+UPDATE_BATCH_SIZE = 300
+
+
+def next_pks(count):
+    """Id для постов, которые вставит bulk_create в SQLite.
+
+    SQLite в bulk_create id не возвращает, поэтому они выдаются заранее:
+    после наибольшего выданного id, включая удалённые посты, чтобы новому
+    посту не достались фрагменты кэша старого. Транзакция начата с
+    BEGIN IMMEDIATE, и чужие вставки до её конца ждут.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT seq FROM sqlite_sequence WHERE name = %s',
+            [Post._meta.db_table],
+        )
+        row = cursor.fetchone()
+    start = (row[0] if row else 0) + 1
+    return range(start, start + count)
+
+
+def set_pub_dates(posts):
+    """Записывает pub_date постов, которые bulk_create заменил на now."""
+    field = Post._meta.get_field('pub_date')
+    for start in range(0, len(posts), UPDATE_BATCH_SIZE):
+        batch = posts[start:start + UPDATE_BATCH_SIZE]
+        Post.objects.filter(pk__in=[post.pk for post in batch]).update(
+            pub_date=Case(
+                *(When(pk=post.pk, then=Value(post.pub_date, field))
+                  for post in batch),
+                output_field=field,
+            )
+        )
+
+
+@transaction.atomic
+def create_posts(posts, record_activity=True):
+    """Сохраняет пачку постов одним bulk_create.
+
+    bulk_create не шлёт post_save, поэтому счётчики, ленты подписчиков,
+    поисковый индекс и статистика групп обновляются здесь сразу для всей
+    пачки. Миниатюры создаются при первом показе карточки.
+
+    record_activity=False пропускает статистику групп: для постов за
+    большой период это запрос на каждый час, и тогда выгоднее один раз
+    вызвать activity.recount_group_activity после загрузки.
+    """
+    if not posts:
+        return posts
+    now = timezone.now()
+    pub_dates = [post.pub_date or now for post in posts]
+    for post, pub_date in zip(posts, pub_dates):
+        post.hot = ranking.hot_score(pub_date, post.comments_count)
+    if connection.vendor == 'sqlite':
+        for post, pk in zip(posts, next_pks(len(posts))):
+            post.pk = pk
+    # auto_now_add подставляет текущее время, нужные даты пишутся после.
+    Post.objects.bulk_create(posts)
+    for post, pub_date in zip(posts, pub_dates):
+        post.pub_date = pub_date
+    set_pub_dates(posts)
+    authors = Counter(post.author_id for post in posts)
+    for author_id, count in authors.items():
+        counters.change_user_stats(author_id, posts_count=count)
+    timeline.fan_out_many(posts)
+    if record_activity:
+        activity.record_posts(posts)
+    search.index_new_posts(posts)
+    fragments.bump_post_versions(authors, {post.group_id for post in posts})
+    return posts
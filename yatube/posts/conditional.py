@@ -0,0 +1,137 @@
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.middleware.csrf import get_token
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .activity import activity_version
+from .fragments import (author_version, feed_version, group_version,
+                        user_version)
+from .models import Group, Post, User
+
+
+def make_etag(request, *versions):
+    """ETag страницы: версии данных, пользователь и параметры запроса.
+
+    Вошедшим пользователям страницы приходят с формами, поэтому в ETag
+    входит и CSRF-кука: после нового входа она меняется, и 304 со
+    старым токеном в форме не отдаётся. Берётся кука, а не get_token:
+    токен из get_token каждый раз с новой солью.
+    """
+    token = ''
+    if request.user.is_authenticated:
+        get_token(request)
+        token = request.META['CSRF_COOKIE']
+    key = ':'.join(map(str, (
+        *versions, request.user.pk, token, request.GET.urlencode()
+    )))
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def version_time(*versions):
+    """Время последнего изменения по версиям, заданным в наносекундах."""
+    return datetime.fromtimestamp(max(versions) / 10 ** 9, tz=timezone.utc)
+
+
+def feed_etag(request, *args, **kwargs):
+    return make_etag(request, feed_version(), *args, *kwargs.values())
+
+
+def feed_last_modified(request, *args, **kwargs):
+    return version_time(feed_version())
+
+
+def activity_etag(request, *args, **kwargs):
+    """Как у ленты, но меняется и раз в час вместе с окнами статистики."""
+    return make_etag(
+        request, feed_version(), activity_version(), *args, *kwargs.values()
+    )
+
+
+def activity_last_modified(request, *args, **kwargs):
+    return version_time(feed_version(), activity_version())
+
+
+def group_versions(request, slug):
+    """Версии постов группы и окон статистики; группа ищется один раз
+    на запрос."""
+    if not hasattr(request, 'group_versions'):
+        group_id = Group.objects.filter(
+            slug=slug
+        ).values_list('pk', flat=True).first()
+        request.group_versions = (group_version(group_id), activity_version())
+    return request.group_versions
+
+
+def group_etag(request, slug):
+    return make_etag(request, slug, *group_versions(request, slug))
+
+
+def group_last_modified(request, slug):
+    return version_time(*group_versions(request, slug))
+
+
+def profile_versions(request, username):
+    """Версии подписок и постов автора; автор ищется один раз на запрос."""
+    if not hasattr(request, 'profile_versions'):
+        author_id = User.objects.filter(
+            username=username
+        ).values_list('pk', flat=True).first()
+        request.profile_versions = (
+            user_version(author_id), author_version(author_id)
+        )
+    return request.profile_versions
+
+
+def profile_etag(request, username):
+    return make_etag(request, username, *profile_versions(request, username))
+
+
+def profile_last_modified(request, username):
+    return version_time(*profile_versions(request, username))
+
+
+def follow_etag(request):
+    return make_etag(
+        request, feed_version(), user_version(request.user.pk)
+    )
+
+
+def follow_last_modified(request):
+    return version_time(feed_version(), user_version(request.user.pk))
+
+
+def post_etag(request, post_id):
+    """Версия поста, счётчик постов автора и группа поста, без загрузки
+    самого поста."""
+    versions = Post.objects.filter(pk=post_id).values_list(
+        'version', 'author__stats__posts_count', 'group__slug', 'group__title'
+    ).first()
+    if versions is None:
+        return None
+    return make_etag(request, post_id, *versions)
+
+
+def conditional(etag_func, last_modified_func=None):
+    """Отвечает 304, если страница не менялась; браузеры и прокси
+    перепроверяют её при каждом показе."""
+    def decorator(view):
+        def etag(request, *args, **kwargs):
+            # Кэш страниц внутри view использует ETag как ключ.
+            request.etag = etag_func(request, *args, **kwargs)
+            return request.etag
+
+        view = condition(etag, last_modified_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            audience = (
+                'private' if request.user.is_authenticated else 'public'
+            )
+            patch_cache_control(response, no_cache=True, **{audience: True})
+            return response
+        return wrapper
+    return decorator
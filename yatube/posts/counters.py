@@ -0,0 +1,53 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, User, UserStats
+from .ranking import hot_change
+
+
+def change_user_stats(user_id, **deltas):
+    """Атомарно сдвигает счётчики пользователя на заданные величины."""
+    UserStats.objects.filter(user_id=user_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+
+
+def change_comments_count(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta,
+        version=F('version') + 1,
+        hot=hot_change(delta),
+    )
+
+
+def count_subquery(queryset, field):
+    """Число строк queryset, сгруппированных по field, как подзапрос."""
+    counts = queryset.filter(
+        **{field: OuterRef('pk')}
+    ).order_by().values(field).annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def recount_comments():
+    """Пересчитывает число комментариев у всех постов одним запросом."""
+    return Post.objects.update(
+        comments_count=count_subquery(Comment.objects.all(), 'post'),
+        version=F('version') + 1,
+    )
+
+
+def recount_user_stats():
+    """Создаёт недостающие строки и пересчитывает счётчики пользователей."""
+    missing = User.objects.filter(stats__isnull=True).values_list(
+        'pk', flat=True
+    )
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=user_id) for user_id in missing.iterator()),
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+    return UserStats.objects.update(
+        posts_count=count_subquery(Post.objects.all(), 'author'),
+        followers_count=count_subquery(Follow.objects.all(), 'author'),
+        following_count=count_subquery(Follow.objects.all(), 'user'),
+    )
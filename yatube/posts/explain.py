@@ -0,0 +1,47 @@
+from django.db import connection
+
+from core.metrics.slow_queries import explain
+
+from .models import Comment, Post, TimelineEntry
+from .utils import keyset_slice
+
+
+def query_plan(queryset):
+    """Строки плана выполнения запроса queryset."""
+    return explain(connection, *queryset.query.sql_with_params())
+
+
+def uses_temp_sort(plan):
+    """Сортирует ли план строки во временном B-дереве вместо индекса."""
+    return any('TEMP B-TREE' in line for line in plan)
+
+
+def feed_queries(user, group, post, position=None, limit=11):
+    """Запросы страниц лент в том виде, в каком их выполняют views.
+
+    Популярное листается с позиции поста post, остальные ленты — с
+    position.
+    """
+    return {
+        'index': keyset_slice(Post.objects.feed(), position, limit),
+        'popular': keyset_slice(
+            Post.objects.feed(),
+            position and (post.hot, post.pk, False),
+            limit,
+            date_field='hot',
+        ),
+        'group': keyset_slice(group.posts.feed(), position, limit),
+        'profile': keyset_slice(user.posts.feed(), position, limit),
+        'follow': keyset_slice(
+            TimelineEntry.objects.filter(user=user),
+            position,
+            limit,
+            pk_field='post_id',
+        ).values_list('post_id', flat=True),
+        'comments': keyset_slice(
+            Comment.objects.filter(post=post).select_related('author'),
+            position,
+            limit,
+            date_field='created',
+        ),
+    }
@@ -0,0 +1,122 @@
+import csv
+import json
+from datetime import datetime
+
+from .models import Comment, Follow, Group, Post
+
+CHUNK_SIZE = 2000
+FORMATS = ('jsonl', 'csv')
+
+# Поле выгрузки и путь к нему в запросе. Посты выгружаются в формате,
+# который понимает import_posts.
+DATASETS = {
+    'groups': (Group, {
+        'id': 'id',
+        'slug': 'slug',
+        'title': 'title',
+        'description': 'description',
+    }),
+    'posts': (Post, {
+        'id': 'id',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'text': 'text',
+        'image': 'image',
+        'pub_date': 'pub_date',
+    }),
+    'comments': (Comment, {
+        'id': 'id',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    }),
+    'follows': (Follow, {
+        'id': 'id',
+        'user': 'user__username',
+        'author': 'author__username',
+    }),
+}
+
+
+def export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def export_rows(dataset, after=0, chunk_size=CHUNK_SIZE):
+    """Строки выгрузки по возрастанию id, начиная после after.
+
+    Запрос читается порциями через iterator(), поэтому память не
+    зависит от размера таблицы, а id последней строки — точка, с
+    которой выгрузку можно продолжить.
+    """
+    model, fields = DATASETS[dataset]
+    rows = model.objects.filter(pk__gt=after).order_by('pk').values_list(
+        *fields.values()
+    ).iterator(chunk_size=chunk_size)
+    for row in rows:
+        yield dict(zip(fields, map(export_value, row)))
+
+
+class Echo:
+    """Файл для csv.writer, который возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def jsonl_lines(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def csv_lines(dataset, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(DATASETS[dataset][1])
+    for row in rows:
+        yield writer.writerow(row.values())
+
+
+def export_lines(dataset, format, after=0, header=True):
+    """Строки файла выгрузки; заголовок CSV можно пропустить при
+    дозаписи."""
+    rows = export_rows(dataset, after)
+    if format == 'jsonl':
+        return jsonl_lines(rows)
+    lines = csv_lines(dataset, rows)
+    if not header:
+        next(lines)
+    return lines
+
+
+def resume_point(path, format):
+    """id последней целой записи файла и её конец в байтах.
+
+    Выгрузку могут прервать посреди записи. Целая запись кончается
+    переводом строки, а в CSV ещё и не обрывается внутри кавычек: текст
+    в CSV может занимать несколько строк файла. Хвост после последней
+    целой записи перед дозаписью нужно отрезать.
+    """
+    last = end = position = 0
+    record = b''
+    with open(path, 'rb') as file:
+        for line in file:
+            position += len(line)
+            record += line
+            if not line.endswith(b'\n') or (
+                format == 'csv' and record.count(b'"') % 2
+            ):
+                continue
+            text = record.decode('utf-8')
+            record = b''
+            end = position
+            if format == 'jsonl':
+                if text.strip():
+                    last = json.loads(text)['id']
+                continue
+            row = next(csv.reader([text]), None)
+            if row and row[0].isdigit():
+                last = int(row[0])
+    return last, end
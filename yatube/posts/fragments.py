@@ -0,0 +1,59 @@
+import time
+
+from django.core.cache import caches
+
+FEED_VERSION_KEY = 'posts:feed_version'
+USER_VERSION_KEY = 'posts:user_version:{}'
+AUTHOR_VERSION_KEY = 'posts:author_version:{}'
+GROUP_VERSION_KEY = 'posts:group_version:{}'
+
+
+def version(key):
+    return caches['fragments'].get_or_set(key, time.time_ns, None)
+
+
+def feed_version():
+    """Версия общей ленты для главной и популярного."""
+    return version(FEED_VERSION_KEY)
+
+
+def user_version(user_id):
+    """Версия подписок и подписчиков пользователя."""
+    return version(USER_VERSION_KEY.format(user_id))
+
+
+def bump_user_versions(*user_ids):
+    now = time.time_ns()
+    caches['fragments'].set_many(
+        {USER_VERSION_KEY.format(user_id): now for user_id in user_ids},
+        None,
+    )
+
+
+def author_version(author_id):
+    """Версия постов автора для его профиля."""
+    return version(AUTHOR_VERSION_KEY.format(author_id))
+
+
+def group_version(group_id):
+    """Версия постов группы для её страницы."""
+    return version(GROUP_VERSION_KEY.format(group_id))
+
+
+def bump_post_versions(author_ids=(), group_ids=(), feed=True):
+    """Сбрасывает ленты авторов и групп изменённых постов и, если feed,
+    общую ленту.
+
+    Пустые id (например, у постов без группы) пропускаются.
+    """
+    now = time.time_ns()
+    versions = {FEED_VERSION_KEY: now} if feed else {}
+    versions.update(
+        (AUTHOR_VERSION_KEY.format(author_id), now)
+        for author_id in author_ids if author_id
+    )
+    versions.update(
+        (GROUP_VERSION_KEY.format(group_id), now)
+        for group_id in group_ids if group_id
+    )
+    caches['fragments'].set_many(versions, None)
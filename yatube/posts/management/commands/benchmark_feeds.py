@@ -0,0 +1,115 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts.explain import feed_queries, query_plan, uses_temp_sort
+from posts.models import Comment, Group, Post, TimelineEntry, User
+
+BATCH_SIZE = 500
+FOLLOWED_AUTHORS = 10
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу тестовыми постами, замеряет запросы лент и '
+        'показывает их планы. Данные откатываются, если не указан --keep.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--authors', type=int, default=100)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--comments', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--keep', action='store_true')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            reader, group, post = self.seed(options)
+            sorted_in_memory = self.report(reader, group, post, options)
+            transaction.set_rollback(not options['keep'])
+        if sorted_in_memory:
+            raise CommandError(
+                'Сортировка без индекса: ' + ', '.join(sorted_in_memory)
+            )
+
+    def seed(self, options):
+        User.objects.bulk_create(
+            User(username=f'bench_author_{i}')
+            for i in range(options['authors'])
+        )
+        authors = list(
+            User.objects.filter(username__startswith='bench_author_')
+        )
+        reader = User.objects.create(username='bench_reader')
+        Group.objects.bulk_create(
+            Group(slug=f'bench-{i}', title=f'Группа {i}', description='')
+            for i in range(options['groups'])
+        )
+        groups = list(Group.objects.filter(slug__startswith='bench-'))
+        for start in range(0, options['posts'], BATCH_SIZE):
+            Post.objects.bulk_create(
+                Post(
+                    text=f'Пост {i}',
+                    author=authors[i % len(authors)],
+                    group=groups[i % len(groups)] if i % 3 else None,
+                )
+                for i in range(
+                    start, min(start + BATCH_SIZE, options['posts'])
+                )
+            )
+        followed = Post.objects.filter(
+            author__in=authors[:FOLLOWED_AUTHORS]
+        ).values_list('pk', 'author_id', 'pub_date')
+        TimelineEntry.objects.bulk_create(
+            (
+                TimelineEntry(
+                    user=reader,
+                    post_id=post_id,
+                    author_id=author_id,
+                    pub_date=pub_date,
+                )
+                for post_id, author_id, pub_date in followed.iterator()
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        post = Post.objects.filter(author=authors[0]).first()
+        Comment.objects.bulk_create(
+            (
+                Comment(post=post, author=reader, text=f'Комментарий {i}')
+                for i in range(options['comments'])
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        return authors[0], groups[0], post
+
+    def report(self, user, group, post, options):
+        middle = Post.objects.order_by('-pub_date', '-pk')[
+            Post.objects.count() // 2
+        ]
+        pages = {
+            'первая страница': feed_queries(user, group, post),
+            'середина ленты': feed_queries(
+                user, group, post, (middle.pub_date, middle.pk, False)
+            ),
+        }
+        sorted_in_memory = []
+        for name in pages['первая страница']:
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for page, queries in pages.items():
+                plan = query_plan(queries[name])
+                if uses_temp_sort(plan):
+                    sorted_in_memory.append(f'{name} ({page})')
+                elapsed = self.measure(queries[name], options['repeat'])
+                self.stdout.write(f'  {page}: {elapsed:.2f} мс')
+                for line in plan:
+                    self.stdout.write(f'    {line}')
+        return sorted_in_memory
+
+    def measure(self, queryset, repeat):
+        """Среднее время выполнения запроса в миллисекундах."""
+        started = time.perf_counter()
+        for _ in range(repeat):
+            list(queryset.all())
+        return (time.perf_counter() - started) * 1000 / max(repeat, 1)
@@ -0,0 +1,63 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import DATASETS, FORMATS, export_lines, resume_point
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает группы, посты, комментарии или подписки в JSONL или CSV '
+        'по возрастанию id, не загружая таблицу в память.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=DATASETS)
+        parser.add_argument('--format', choices=FORMATS, default='jsonl')
+        parser.add_argument(
+            '--output',
+            help='Файл выгрузки; по умолчанию стандартный вывод.',
+        )
+        parser.add_argument(
+            '--after',
+            type=int,
+            default=0,
+            help='Выгружать строки с id больше этого.',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Дописать --output, продолжив после его последней строки.',
+        )
+
+    def handle(self, *args, **options):
+        path, after = options['output'], options['after']
+        resume = options['resume'] and path and os.path.exists(path)
+        if options['resume'] and not path:
+            raise CommandError('--resume работает только с --output.')
+        if resume:
+            last, end = resume_point(path, options['format'])
+            with open(path, 'r+b') as file:
+                file.truncate(end)
+            after = max(after, last)
+            # Не уцелело ни одной записи, даже заголовка CSV: файл
+            # пишется заново.
+            resume = end > 0
+        lines = export_lines(
+            options['dataset'], options['format'], after, header=not resume
+        )
+        if path is None:
+            self.write(sys.stdout, lines, after)
+            return
+        with open(path, 'a' if resume else 'w', newline='',
+                  encoding='utf-8') as file:
+            self.write(file, lines, after)
+
+    def write(self, file, lines, after):
+        count = 0
+        for count, line in enumerate(lines, 1):
+            file.write(line)
+        self.stderr.write(
+            f'Выгружено строк: {count}, начиная после id {after}'
+        )
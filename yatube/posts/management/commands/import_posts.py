@@ -0,0 +1,165 @@
+import csv
+import json
+import os
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts.bulk import create_posts
+from posts.models import Group, Post, User
+
+
+class RowError(ValueError):
+    """Строку нельзя импортировать; сообщение — причина."""
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует посты из JSONL или CSV с полями author, group, text, '
+        'image и pub_date. Авторы и группы ищутся по username и slug.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=('jsonl', 'csv'))
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--images-dir',
+            default='.',
+            help='Каталог, от которого отсчитываются пути картинок.',
+        )
+        parser.add_argument(
+            '--create-missing',
+            action='store_true',
+            help='Создавать неизвестных авторов и группы.',
+        )
+
+    def handle(self, *args, **options):
+        format = options['format'] or os.path.splitext(
+            options['path']
+        )[1].lstrip('.')
+        if format not in ('jsonl', 'csv'):
+            raise CommandError('Укажите --format: jsonl или csv.')
+        self.options = options
+        self.authors = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.imported = self.skipped = 0
+        with open(options['path'], newline='', encoding='utf-8') as file:
+            batch = []
+            for line, row in self.read_rows(file, format):
+                post = self.build_post(line, row)
+                if post is not None:
+                    batch.append(post)
+                if len(batch) == options['batch_size']:
+                    self.save(batch)
+                    batch = []
+            self.save(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано постов: {self.imported}, '
+            f'пропущено: {self.skipped}'
+        ))
+
+    def read_rows(self, file, format):
+        """Номер строки и словарь полей; None для нечитаемой строки."""
+        if format == 'csv':
+            reader = csv.DictReader(file)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for line, text in enumerate(file, 1):
+            if not text.strip():
+                continue
+            try:
+                row = json.loads(text)
+            except ValueError:
+                row = None
+            yield line, row if isinstance(row, dict) else None
+
+    def save(self, batch):
+        create_posts(batch)
+        self.imported += len(batch)
+        if batch:
+            self.stdout.write(f'Импортировано: {self.imported}')
+
+    def build_post(self, line, row):
+        try:
+            return self.post_from_row(row)
+        except RowError as error:
+            self.skipped += 1
+            self.stderr.write(f'Строка {line}: {error}')
+            return None
+
+    def post_from_row(self, row):
+        if row is None:
+            raise RowError('не удалось разобрать')
+        if not row.get('text'):
+            raise RowError('нет текста')
+        author_id = self.lookup(
+            self.authors, row.get('author'), self.create_author
+        )
+        if author_id is None:
+            raise RowError(f'нет автора {row.get("author")!r}')
+        group_id = None
+        if row.get('group'):
+            group_id = self.lookup(
+                self.groups, row['group'], self.create_group
+            )
+            if group_id is None:
+                raise RowError(f'нет группы {row["group"]!r}')
+        return Post(
+            text=row['text'],
+            author_id=author_id,
+            group_id=group_id,
+            pub_date=self.parse_date(row.get('pub_date')),
+            image=self.copy_image(row.get('image')),
+        )
+
+    def lookup(self, known, key, create):
+        if not key:
+            return None
+        if key not in known and self.options['create_missing']:
+            known[key] = create(key)
+        return known.get(key)
+
+    def create_author(self, username):
+        return User.objects.create_user(username=username).pk
+
+    def create_group(self, slug):
+        return Group.objects.create(slug=slug, title=slug).pk
+
+    def parse_date(self, value):
+        """ISO 8601 или секунды Unix; пустое значение — текущее время."""
+        if value in (None, ''):
+            return None
+        try:
+            return datetime.fromtimestamp(float(value), tz=dt_timezone.utc)
+        except (TypeError, ValueError, OverflowError, OSError):
+            pass
+        try:
+            pub_date = parse_datetime(str(value))
+        except ValueError:
+            pub_date = None
+        if pub_date is None:
+            raise RowError(f'неверная дата {value!r}')
+        if timezone.is_naive(pub_date):
+            pub_date = timezone.make_aware(pub_date)
+        return pub_date
+
+    def copy_image(self, path):
+        """Копирует картинку в хранилище и возвращает её имя там."""
+        if not path:
+            return ''
+        field = Post._meta.get_field('image')
+        source = os.path.join(self.options['images_dir'], path)
+        try:
+            with open(source, 'rb') as image:
+                return default_storage.save(
+                    field.generate_filename(None, os.path.basename(path)),
+                    File(image),
+                )
+        except OSError as error:
+            raise RowError(f'картинка не скопирована: {error}')
@@ -0,0 +1,335 @@
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import urlencode
+
+from core.metrics.profiling import Capture
+from posts.models import Group, Post, User
+from posts.seeding import WORDS, seed
+
+# Имя, метод и нужен ли вход для каждой страницы.
+ENDPOINTS = (
+    ('index', 'GET', False),
+    ('popular', 'GET', False),
+    ('group_list', 'GET', False),
+    ('trending', 'GET', False),
+    ('profile', 'GET', False),
+    ('post_detail', 'GET', False),
+    ('search', 'GET', False),
+    ('follow_index', 'GET', True),
+    ('profile_follow', 'GET', True),
+    ('profile_unfollow', 'GET', True),
+    ('add_comment', 'POST', True),
+    ('post_create', 'POST', True),
+    ('post_edit', 'POST', True),
+)
+# Запросов на поток в прогоне под tracemalloc.
+MEMORY_REQUESTS = 10
+
+
+def percentile(values, share):
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет временную базу, нагружает страницы posts параллельными '
+        'запросами через обработчик Django и сохраняет отчёт в JSON: '
+        'RPS, перцентили задержки, запросы к базе и пик выделенной памяти.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=20)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--anonymous',
+            action='store_true',
+            help='Открывать страницы без входа, через кэш страниц.',
+        )
+        parser.add_argument('--endpoints', help='Имена через запятую.')
+        parser.add_argument('--output', default='loadtest.json')
+        parser.add_argument(
+            '--compare',
+            help='Прошлый отчёт: показать изменение RPS и p95.',
+        )
+
+    def handle(self, *args, **options):
+        endpoints = ENDPOINTS
+        if options['endpoints']:
+            names = options['endpoints'].split(',')
+            endpoints = [item for item in ENDPOINTS if item[0] in names]
+            if len(endpoints) != len(names):
+                raise CommandError(
+                    'Доступные страницы: '
+                    + ', '.join(name for name, *_ in ENDPOINTS)
+                )
+        with tempfile.TemporaryDirectory() as directory:
+            with self.isolated(directory):
+                started = time.perf_counter()
+                seed(
+                    users=options['users'],
+                    groups=options['groups'],
+                    posts=options['posts'],
+                    comments=options['comments'],
+                    follows=options['follows'],
+                    seed=options['seed'],
+                    prefix='load',
+                )
+                self.stdout.write(
+                    f'Данные созданы за {time.perf_counter() - started:.1f} с'
+                )
+                targets = self.targets()
+                self.errors = set()
+                results = {}
+                for name, method, login in endpoints:
+                    results[name] = self.run(
+                        name, method, login, targets, options
+                    )
+                    self.print_result(name, results[name])
+        for error in sorted(self.errors):
+            self.stderr.write(error)
+        report = {'meta': self.meta(options), 'endpoints': results}
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(
+            f'Отчёт сохранён в {options["output"]}'
+        ))
+        if options['compare']:
+            self.compare(options['compare'], results)
+
+    @contextmanager
+    def isolated(self, directory):
+        """Отдельная база-файл и отдельные ключи кэша на время замера."""
+        caches = {
+            alias: {
+                **config,
+                'KEY_PREFIX': f'{config.get("KEY_PREFIX", "")}:loadtest',
+            }
+            for alias, config in settings.CACHES.items()
+        }
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        test_name = test_settings.get('NAME')
+        test_settings['NAME'] = os.path.join(directory, 'loadtest.sqlite3')
+        with override_settings(
+            CACHES=caches,
+            REPLICA_DATABASES={},
+            ALLOWED_HOSTS=['testserver'],
+            DEBUG=False,
+        ):
+            old_name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False
+            )
+            try:
+                yield
+            finally:
+                connections.close_all()
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                test_settings['NAME'] = test_name
+
+    def targets(self):
+        own_posts = {}
+        posts = Post.objects.values_list('author', 'pk', 'group')
+        for author_id, post_id, group_id in posts.iterator():
+            own_posts.setdefault(author_id, []).append((post_id, group_id))
+        users = list(User.objects.values_list('pk', 'username'))
+        return {
+            'users': users,
+            'authors': [user for user in users if user[0] in own_posts],
+            'groups': list(Group.objects.values_list('slug', flat=True)),
+            'posts': list(Post.objects.values_list('pk', flat=True)),
+            'own_posts': own_posts,
+        }
+
+    def request(self, name, method, rng, targets, user_id):
+        """URL и данные формы для случайного объекта страницы."""
+        if name == 'group_list':
+            return reverse('posts:group_list', args=[
+                rng.choice(targets['groups'])
+            ]), None
+        if name in ('profile', 'profile_follow', 'profile_unfollow'):
+            return reverse(f'posts:{name}', args=[
+                rng.choice(targets['users'])[1]
+            ]), None
+        if name == 'search':
+            query = ' '.join(rng.sample(WORDS, 2))
+            return f'{reverse("posts:search")}?{urlencode({"q": query})}', None
+        if name == 'post_edit':
+            # Правит свой пост, не меняя группу.
+            post_id, group_id = rng.choice(targets['own_posts'][user_id])
+            url = reverse('posts:post_edit', args=[post_id])
+            return url, {'text': 'Правка нагрузки', 'group': group_id or ''}
+        if name in ('post_detail', 'add_comment'):
+            url = reverse(f'posts:{name}', args=[
+                rng.choice(targets['posts'])
+            ])
+            return url, {'text': 'Комментарий нагрузки'}
+        return reverse(f'posts:{name}'), {'text': 'Пост нагрузки'}
+
+    def run(self, name, method, login, targets, options):
+        """Запросы к одной странице в несколько потоков."""
+        login = login or not options['anonymous']
+        per_worker = max(1, options['requests'] // options['concurrency'])
+        started = time.perf_counter()
+        samples = self.load(
+            name, method, login, targets, per_worker, options, 'timing'
+        )
+        elapsed = time.perf_counter() - started
+        latencies = sorted(latency for latency, _, _ in samples)
+        queries = [count for _, count, _ in samples]
+        errors = sum(1 for _, _, status in samples if status >= 400)
+        return {
+            'requests': len(samples),
+            'errors': errors,
+            'rps': round(len(samples) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 0.5) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+            'queries_mean': round(statistics.mean(queries), 2),
+            'queries_max': max(queries),
+            'peak_traced_kb': self.peak_traced(
+                name, method, login, targets, options
+            ),
+        }
+
+    def load(self, name, method, login, targets, count, options, stage):
+        """Образцы всех потоков, по count запросов в каждом."""
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            workers = [
+                executor.submit(
+                    self.work, name, method, login, targets, count,
+                    random.Random(
+                        f'{options["seed"]}:{name}:{stage}:{worker}'
+                    ),
+                )
+                for worker in range(options['concurrency'])
+            ]
+            return [
+                sample for worker in workers for sample in worker.result()
+            ]
+
+    def peak_traced(self, name, method, login, targets, options):
+        """Пик памяти, выделенной Python за короткий прогон страницы.
+
+        tracemalloc замедляет запросы в разы, поэтому прогон отдельный и
+        на время и RPS не влияет.
+        """
+        capture = Capture(('memory',))
+        capture.run(
+            self.load, name, method, login, targets, MEMORY_REQUESTS, options,
+            'memory',
+        )
+        return round(capture.peak / 1024)
+
+    def work(self, name, method, login, targets, count, rng):
+        """Задержка, число запросов к базе и код ответа каждого запроса."""
+        client = Client()
+        user_id = None
+        if login:
+            users = targets['authors' if name == 'post_edit' else 'users']
+            user_id = rng.choice(users)[0]
+            client.force_login(User.objects.get(pk=user_id))
+        queries = threading.local()
+
+        def count_queries(execute, sql, params, many, context):
+            queries.count += 1
+            return execute(sql, params, many, context)
+
+        samples = []
+        try:
+            with connection.execute_wrapper(count_queries):
+                for _ in range(count):
+                    url, data = self.request(
+                        name, method, rng, targets, user_id
+                    )
+                    queries.count = 0
+                    started = time.perf_counter()
+                    try:
+                        if method == 'POST':
+                            status = client.post(url, data).status_code
+                        else:
+                            status = client.get(url).status_code
+                    except Exception as error:
+                        # Client пробрасывает исключения view; под
+                        # нагрузкой это ответ 500.
+                        self.errors.add(f'{name}: {error!r}')
+                        status = 500
+                    samples.append((
+                        time.perf_counter() - started, queries.count, status
+                    ))
+        finally:
+            connections.close_all()
+        return samples
+
+    def print_result(self, name, result):
+        self.stdout.write(
+            f'{name:>16}: {result["rps"]:8.1f} RPS, '
+            f'p50 {result["p50_ms"]:.1f} мс, p95 {result["p95_ms"]:.1f} мс, '
+            f'p99 {result["p99_ms"]:.1f} мс, '
+            f'запросов {result["queries_mean"]:.1f}, '
+            f'ошибок {result["errors"]}'
+        )
+
+    def meta(self, options):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', 'HEAD'],
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'commit': commit,
+            'created': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'database': connections[DEFAULT_DB_ALIAS].vendor,
+            'options': {
+                key: options[key] for key in (
+                    'users', 'groups', 'posts', 'comments', 'follows',
+                    'requests', 'concurrency', 'seed', 'anonymous',
+                )
+            },
+        }
+
+    def compare(self, path, results):
+        with open(path, encoding='utf-8') as file:
+            previous = json.load(file)['endpoints']
+        self.stdout.write(self.style.MIGRATE_HEADING('Изменение к отчёту'))
+        for name, result in results.items():
+            if name not in previous:
+                continue
+            before = previous[name]
+            self.stdout.write(
+                f'{name:>16}: RPS {self.change(before["rps"], result["rps"])}'
+                f', p95 {self.change(before["p95_ms"], result["p95_ms"])}'
+            )
+
+    def change(self, before, after):
+        if not before:
+            return 'н/д'
+        return f'{(after - before) / before * 100:+.1f}%'
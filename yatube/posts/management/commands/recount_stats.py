@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.activity import recount_group_activity
+from posts.counters import recount_comments, recount_user_stats
+from posts.ranking import recount_hot
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счётчики постов, подписок и комментариев, '
+        'популярность постов и статистику групп за последнюю неделю.'
+    )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        users = recount_user_stats()
+        posts = recount_comments()
+        recount_hot()
+        hours = recount_group_activity()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано пользователей: {users}, постов: {posts}, '
+            f'часов активности групп: {hours}'
+        ))
@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.seeding import PASSWORD, seed
+
+
+class Command(BaseCommand):
+    help = (
+        'Быстро заполняет базу синтетическими пользователями, группами, '
+        'постами, комментариями и подписками. Популярность авторов '
+        'распределена по степенному закону, данные зависят только от --seed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--comments', type=int, default=1000000)
+        parser.add_argument(
+            '--follows',
+            type=float,
+            default=20,
+            help='Среднее число подписок у пользователя.',
+        )
+        parser.add_argument(
+            '--alpha',
+            type=float,
+            default=1.1,
+            help='Показатель степенного закона: больше — сильнее перекос.',
+        )
+        parser.add_argument(
+            '--images',
+            type=float,
+            default=0,
+            help='Доля постов с картинкой-заглушкой, от 0 до 1.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--prefix',
+            default='seed',
+            help='Начало имён пользователей и slug групп.',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        users, groups = seed(
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            comments=options['comments'],
+            follows=options['follows'],
+            seed=options['seed'],
+            prefix=options['prefix'],
+            alpha=options['alpha'],
+            images=options['images'],
+            progress=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(users)}, групп: {len(groups)} '
+            f'за {time.perf_counter() - started:.1f} с. '
+            f'Пароль пользователей: {PASSWORD}'
+        ))
@@ -0,0 +1,51 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.decorators import decorator_from_middleware
+
+PAGE_KEY = 'posts:page:{}'
+
+
+class AnonymousPageCacheMiddleware:
+    """Готовые страницы для анонимов по ключу из ETag страницы.
+
+    ETag складывается из версий ленты, группы, поста и автора, поэтому новые
+    посты, комментарии и подписки сразу уводят на новый ключ, а старые
+    страницы вытесняются по таймауту. Вешается на view через
+    cache_anonymous_page внутри conditional, который задаёт request.etag.
+    """
+
+    def __init__(self, get_response=None):
+        self.get_response = get_response
+
+    def page_key(self, request):
+        if (
+            request.method not in ('GET', 'HEAD')
+            or request.user.is_authenticated
+            or not getattr(request, 'etag', None)
+        ):
+            return None
+        key = f'{request.path}:{request.etag}'
+        return PAGE_KEY.format(hashlib.md5(key.encode()).hexdigest())
+
+    def process_request(self, request):
+        key = self.page_key(request)
+        if key is not None:
+            return cache.get(key)
+        return None
+
+    def process_response(self, request, response):
+        key = self.page_key(request)
+        if (
+            key is not None
+            and request.method == 'GET'
+            and response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+        ):
+            cache.set(key, response, settings.PAGE_CACHE_TIMEOUT)
+        return response
+
+
+cache_anonymous_page = decorator_from_middleware(AnonymousPageCacheMiddleware)
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-17 05:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Увеличивается при изменении поста и комментариях', verbose_name='Версия'),
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from posts.search import count_terms, terms
+
+FTS_TABLE = 'posts_post_search'
+BATCH_SIZE = 500
+
+
+def fts5_supported(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return any(option == 'ENABLE_FTS5' for option, in cursor.fetchall())
+
+
+def create_fts_table(apps, schema_editor):
+    if fts5_supported(schema_editor.connection):
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(body)'
+        )
+
+
+def fill_index(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    SearchTerm = apps.get_model('posts', 'SearchTerm')
+    connection = schema_editor.connection
+    posts = Post.objects.order_by().values_list('pk', 'text').iterator()
+    if settings.SEARCH_BACKEND == 'fts5' or (
+        settings.SEARCH_BACKEND == 'auto' and fts5_supported(connection)
+    ):
+        with connection.cursor() as cursor:
+            batch = []
+            for post_id, text in posts:
+                batch.append((post_id, ' '.join(terms(text))))
+                if len(batch) == BATCH_SIZE:
+                    insert_fts_batch(cursor, batch)
+                    batch = []
+            insert_fts_batch(cursor, batch)
+        return
+    batch = []
+    for post_id, text in posts:
+        batch.extend(
+            SearchTerm(term=term, post_id=post_id, count=count)
+            for term, count in count_terms(terms(text)).items()
+        )
+        if len(batch) >= BATCH_SIZE:
+            SearchTerm.objects.bulk_create(batch)
+            batch = []
+    SearchTerm.objects.bulk_create(batch)
+
+
+def insert_fts_batch(cursor, batch):
+    if batch:
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, body) VALUES (%s, %s)', batch
+        )
+
+
+def drop_fts_table(apps, schema_editor):
+    if fts5_supported(schema_editor.connection):
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_post_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Основа')),
+                ('count', models.PositiveIntegerField(verbose_name='Число вхождений')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='posts.Post')),
+            ],
+            options={
+                'verbose_name': 'Поисковый термин',
+                'verbose_name_plural': 'Поисковые термины',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchterm',
+            constraint=models.UniqueConstraint(fields=('term', 'post'), name='unique_search_term'),
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+        migrations.RunPython(fill_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,106 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:27
+
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max
+from django.db.models.functions import TruncHour
+import django.db.models.deletion
+
+from posts.activity import window_start
+
+
+def fill_activity(apps, schema_editor):
+    """Статистика групп за последнюю неделю, как в recount_group_activity."""
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    GroupActivity = apps.get_model('posts', 'GroupActivity')
+    GroupAuthor = apps.get_model('posts', 'GroupAuthor')
+    since = window_start('week')
+    rows = {}
+    counted = (
+        (Post.objects.filter(pub_date__gte=since, group__isnull=False),
+         'group', 'pub_date', 'posts_count'),
+        (Comment.objects.filter(created__gte=since, post__group__isnull=False),
+         'post__group', 'created', 'comments_count'),
+    )
+    for queryset, group, date, field in counted:
+        counts = queryset.annotate(
+            bucket=TruncHour(date, tzinfo=dt_timezone.utc)
+        ).order_by().values_list(group, 'bucket').annotate(count=Count('pk'))
+        for group_id, bucket, count in counts:
+            row = rows.setdefault(
+                (group_id, bucket),
+                GroupActivity(group_id=group_id, bucket=bucket),
+            )
+            setattr(row, field, count)
+    GroupActivity.objects.bulk_create(rows.values(), batch_size=500)
+    authors = Post.objects.filter(
+        pub_date__gte=since, group__isnull=False
+    ).order_by().values_list('group', 'author').annotate(
+        last_posted=Max('pub_date')
+    )
+    GroupAuthor.objects.bulk_create(
+        (
+            GroupAuthor(group_id=group_id, author_id=author_id,
+                        last_posted=last_posted)
+            for group_id, author_id, last_posted in authors.iterator()
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0011_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupAuthor',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_posted', models.DateTimeField(verbose_name='Последний пост')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recent_authors', to='posts.Group')),
+            ],
+            options={
+                'verbose_name': 'Автор группы',
+                'verbose_name_plural': 'Авторы групп',
+            },
+        ),
+        migrations.CreateModel(
+            name='GroupActivity',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(verbose_name='Начало часа')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Число постов')),
+                ('comments_count', models.PositiveIntegerField(default=0, verbose_name='Число комментариев')),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity', to='posts.Group')),
+            ],
+            options={
+                'verbose_name': 'Активность группы',
+                'verbose_name_plural': 'Активность групп',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='groupauthor',
+            index=models.Index(fields=['group', 'last_posted'], name='group_author_last_posted_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='groupauthor',
+            constraint=models.UniqueConstraint(fields=('group', 'author'), name='unique_group_author'),
+        ),
+        migrations.AddIndex(
+            model_name='groupactivity',
+            index=models.Index(fields=['bucket'], name='group_activity_bucket_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='groupactivity',
+            constraint=models.UniqueConstraint(fields=('group', 'bucket'), name='unique_group_activity'),
+        ),
+        migrations.RunPython(fill_activity, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:30
+
+import math
+
+from django.conf import settings
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+
+def fill_hot(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    posts = Post.objects.only('pub_date', 'comments_count')
+    batch = []
+    for post in posts.iterator():
+        post.hot = (
+            math.log2(1 + post.comments_count)
+            + post.pub_date.timestamp() / settings.HOT_HALF_LIFE
+        )
+        batch.append(post)
+        if len(batch) == BATCH_SIZE:
+            Post.objects.bulk_update(batch, ['hot'])
+            batch = []
+    Post.objects.bulk_update(batch, ['hot'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_group_activity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='hot',
+            field=models.FloatField(default=0, editable=False, help_text='Обсуждение с поправкой на возраст, см. posts.ranking', verbose_name='Популярность'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-hot', '-id'], name='post_hot_idx'),
+        ),
+        migrations.RunPython(fill_hot, migrations.RunPython.noop),
+    ]
@@ -14,6 +14,17 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def feed(self):
+        """Посты для ленты: автор и группа одним запросом."""
+        return self.select_related('author', 'group').only(
+            'text', 'pub_date', 'image', 'comments_count', 'version', 'hot',
+            'author_id', 'group_id',
+            'author__username', 'author__first_name', 'author__last_name',
+            'group__title', 'group__slug',
+        )
+
+
 class Post(models.Model):
     text = models.TextField(
         'Текст поста',
@@ -44,12 +55,46 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False
+    )
+    version = models.PositiveIntegerField(
+        'Версия',
+        default=0,
+        editable=False,
+        help_text='Увеличивается при изменении поста и комментариях'
+    )
+    hot = models.FloatField(
+        'Популярность',
+        default=0,
+        editable=False,
+        help_text='Обсуждение с поправкой на возраст, см. posts.ranking'
+    )
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return self.text
 
     class Meta:
         ordering = ("-pub_date",)
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx',
+            ),
+            models.Index(fields=['-hot', '-id'], name='post_hot_idx'),
+        ]
 
 
 class Comment(models.Model):
@@ -77,6 +122,12 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ("-created",)
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx',
+            ),
+        ]
 
 
 class Follow(models.Model):
@@ -97,3 +148,132 @@ class Follow(models.Model):
         ]
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, обновляемые при записи."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков',
+        default=0
+    )
+    following_count = models.PositiveIntegerField('Число подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Статистика пользователя'
+        verbose_name_plural = 'Статистика пользователей'
+
+
+class TimelineEntry(models.Model):
+    """Пост в ленте подписок пользователя, разложенный при публикации."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date', '-post')
+        constraints = [models.UniqueConstraint(
+            fields=['user', 'post'], name='unique_timeline_entry')
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx',
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author_idx',
+            ),
+        ]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+
+
+class SearchTerm(models.Model):
+    """Основа слова поста в поисковом индексе без FTS5."""
+    term = models.CharField('Основа', max_length=64)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='search_terms',
+    )
+    count = models.PositiveIntegerField('Число вхождений')
+
+    class Meta:
+        constraints = [models.UniqueConstraint(
+            fields=['term', 'post'], name='unique_search_term')
+        ]
+        verbose_name = 'Поисковый термин'
+        verbose_name_plural = 'Поисковые термины'
+
+
+class GroupActivity(models.Model):
+    """Число постов и комментариев группы за один час."""
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='activity',
+    )
+    bucket = models.DateTimeField('Начало часа')
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0
+    )
+
+    class Meta:
+        constraints = [models.UniqueConstraint(
+            fields=['group', 'bucket'], name='unique_group_activity')
+        ]
+        indexes = [
+            models.Index(fields=['bucket'], name='group_activity_bucket_idx'),
+        ]
+        verbose_name = 'Активность группы'
+        verbose_name_plural = 'Активность групп'
+
+
+class GroupAuthor(models.Model):
+    """Когда автор последний раз писал в группу."""
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='recent_authors',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    last_posted = models.DateTimeField('Последний пост')
+
+    class Meta:
+        constraints = [models.UniqueConstraint(
+            fields=['group', 'author'], name='unique_group_author')
+        ]
+        indexes = [
+            models.Index(
+                fields=['group', 'last_posted'],
+                name='group_author_last_posted_idx',
+            ),
+        ]
+        verbose_name = 'Автор группы'
+        verbose_name_plural = 'Авторы групп'
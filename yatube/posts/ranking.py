@@ -0,0 +1,51 @@
+import math
+
+from django.conf import settings
+from django.db.models import F
+from django.db.models.functions import Log
+
+from .models import Post
+
+BATCH_SIZE = 500
+
+
+def hot_score(pub_date, comments_count):
+    """Популярность поста: log2 обсуждения плюс возраст в периодах
+    полураспада.
+
+    Порядок по такому числу совпадает с порядком по (1 + комментарии),
+    убывающему вдвое каждые HOT_HALF_LIFE секунд, но пересчитывать
+    старые посты со временем не нужно.
+    """
+    return (
+        math.log2(1 + comments_count)
+        + pub_date.timestamp() / settings.HOT_HALF_LIFE
+    )
+
+
+def hot_change(delta):
+    """Выражение нового значения hot при изменении числа комментариев.
+
+    Вычисляется в том же UPDATE, что и comments_count, поэтому F() в
+    нём — ещё старое число комментариев.
+    """
+    return (
+        F('hot')
+        - Log(2, F('comments_count') + 1)
+        + Log(2, F('comments_count') + 1 + delta)
+    )
+
+
+def recount_hot(posts=None):
+    """Пересчитывает популярность постов по их дате и комментариям."""
+    if posts is None:
+        posts = Post.objects.all()
+    posts = posts.only('pub_date', 'comments_count', 'hot')
+    batch = []
+    for post in posts.iterator():
+        post.hot = hot_score(post.pub_date, post.comments_count)
+        batch.append(post)
+        if len(batch) == BATCH_SIZE:
+            Post.objects.bulk_update(batch, ['hot'])
+            batch = []
+    Post.objects.bulk_update(batch, ['hot'])
@@ -0,0 +1,332 @@
+import math
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import (Case, Count, ExpressionWrapper, F, FloatField,
+                              Max, Sum, Value, When)
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post, SearchTerm
+
+FTS_TABLE = 'posts_post_search'
+WORD_RE = re.compile(r'\w+')
+SNIPPET_WORDS = 30
+BATCH_SIZE = 500
+
+STOP_WORDS = frozenset((
+    'и', 'в', 'во', 'не', 'что', 'он', 'на', 'я', 'с', 'со', 'как', 'а',
+    'то', 'все', 'она', 'так', 'его', 'но', 'да', 'ты', 'к', 'у', 'же',
+    'вы', 'за', 'бы', 'по', 'ее', 'мне', 'было', 'вот', 'от', 'меня',
+    'о', 'из', 'ему', 'ли', 'если', 'или', 'ни', 'быть', 'был', 'до',
+    'для', 'мы', 'это', 'они', 'их', 'при', 'там', 'где', 'есть',
+))
+
+VOWELS = 'аеиоуыэюя'
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+REFLEXIVE = ((), ('ся', 'сь'))
+ADJECTIVE = ((), (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+))
+PARTICIPLE = (('ем', 'нн', 'вш', 'ющ', 'щ'), ('ивш', 'ывш', 'ующ'))
+VERB = (
+    (
+        'ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но',
+        'ет', 'ют', 'ны', 'ть', 'ешь', 'нно',
+    ),
+    (
+        'ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей',
+        'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят',
+        'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю',
+    ),
+)
+NOUN = ((), (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+    'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+    'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+    'ья', 'я',
+))
+SUPERLATIVE = ((), ('ейше', 'ейш'))
+DERIVATIONAL = ((), ('ост', 'ость'))
+
+
+def region_after_vowel(word, start=0):
+    """Начало области после первой согласной, идущей за гласной.
+
+    Гласная ищется не раньше позиции start.
+    """
+    for i in range(start + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            return i + 1
+    return len(word)
+
+
+def strip_ending(word, start, endings):
+    """Снимает самое длинное окончание из endings внутри word[start:].
+
+    Окончания первой группы снимаются, только если перед ними «а» или «я».
+    """
+    after_a, plain = endings
+    candidates = sorted(
+        [(ending, True) for ending in after_a]
+        + [(ending, False) for ending in plain],
+        key=lambda candidate: -len(candidate[0]),
+    )
+    for ending, needs_a in candidates:
+        cut = len(word) - len(ending)
+        if cut < start or not word.endswith(ending):
+            continue
+        if needs_a and (cut - 1 < start or word[cut - 1] not in 'ая'):
+            return None
+        return word[:cut]
+    return None
+
+
+@lru_cache(maxsize=65536)
+def stem(word):
+    """Основа русского слова по алгоритму Snowball (Портера)."""
+    rv = next(
+        (i + 1 for i, letter in enumerate(word) if letter in VOWELS),
+        len(word),
+    )
+    r2 = region_after_vowel(word, region_after_vowel(word))
+    stemmed = strip_ending(word, rv, PERFECTIVE_GERUND)
+    if stemmed is None:
+        stemmed = strip_ending(word, rv, REFLEXIVE) or word
+        adjective = strip_ending(stemmed, rv, ADJECTIVE)
+        if adjective is not None:
+            stemmed = strip_ending(adjective, rv, PARTICIPLE) or adjective
+        else:
+            stemmed = (
+                strip_ending(stemmed, rv, VERB)
+                or strip_ending(stemmed, rv, NOUN)
+                or stemmed
+            )
+    if stemmed.endswith('и') and len(stemmed) > rv:
+        stemmed = stemmed[:-1]
+    stemmed = strip_ending(stemmed, r2, DERIVATIONAL) or stemmed
+    if stemmed.endswith('нн') and len(stemmed) - 1 > rv:
+        return stemmed[:-1]
+    superlative = strip_ending(stemmed, rv, SUPERLATIVE)
+    if superlative is not None:
+        if superlative.endswith('нн'):
+            return superlative[:-1]
+        return superlative
+    if stemmed.endswith('ь') and len(stemmed) > rv:
+        return stemmed[:-1]
+    return stemmed
+
+
+def normalize(word):
+    return stem(word.lower().replace('ё', 'е'))
+
+
+def terms(text):
+    """Основы значимых слов текста в порядке появления."""
+    return [
+        normalize(word) for word in WORD_RE.findall(text)
+        if word.lower() not in STOP_WORDS
+    ]
+
+
+@lru_cache(maxsize=None)
+def fts5_supported():
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return any(
+            option == 'ENABLE_FTS5' for option, in cursor.fetchall()
+        )
+
+
+def use_fts5():
+    if settings.SEARCH_BACKEND == 'auto':
+        return connection.vendor == 'sqlite' and fts5_supported()
+    return settings.SEARCH_BACKEND == 'fts5'
+
+
+def index_post(post):
+    """Обновляет запись поста в поисковом индексе."""
+    post_terms = terms(post.text)
+    if use_fts5():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk]
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, body) VALUES (%s, %s)',
+                [post.pk, ' '.join(post_terms)],
+            )
+        return
+    SearchTerm.objects.filter(post_id=post.pk).delete()
+    SearchTerm.objects.bulk_create(
+        SearchTerm(term=term, post_id=post.pk, count=count)
+        for term, count in count_terms(post_terms).items()
+    )
+
+
+def index_new_posts(posts):
+    """Добавляет в индекс пачку только что созданных постов."""
+    if use_fts5():
+        with connection.cursor() as cursor:
+            insert_fts_batch(
+                cursor,
+                [(post.pk, ' '.join(terms(post.text))) for post in posts],
+            )
+        return
+    SearchTerm.objects.bulk_create(
+        (
+            SearchTerm(term=term, post_id=post.pk, count=count)
+            for post in posts
+            for term, count in count_terms(terms(post.text)).items()
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+def remove_post(post_id):
+    if use_fts5():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id]
+            )
+
+
+def count_terms(post_terms):
+    counts = {}
+    for term in post_terms:
+        if len(term) <= SearchTerm._meta.get_field('term').max_length:
+            counts[term] = counts.get(term, 0) + 1
+    return counts
+
+
+def rebuild_index():
+    """Перестраивает индекс целиком, например после массового импорта."""
+    posts = Post.objects.order_by().values_list('pk', 'text').iterator()
+    total = 0
+    if use_fts5():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            batch = []
+            for post_id, text in posts:
+                batch.append((post_id, ' '.join(terms(text))))
+                total += 1
+                if len(batch) == BATCH_SIZE:
+                    insert_fts_batch(cursor, batch)
+                    batch = []
+            insert_fts_batch(cursor, batch)
+        return total
+    SearchTerm.objects.all().delete()
+    batch = []
+    for post_id, text in posts:
+        batch.extend(
+            SearchTerm(term=term, post_id=post_id, count=count)
+            for term, count in count_terms(terms(text)).items()
+        )
+        total += 1
+        if len(batch) >= BATCH_SIZE:
+            SearchTerm.objects.bulk_create(batch)
+            batch = []
+    SearchTerm.objects.bulk_create(batch)
+    return total
+
+
+def insert_fts_batch(cursor, batch):
+    if batch:
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, body) VALUES (%s, %s)', batch
+        )
+
+
+def search_post_ids(query_terms, limit):
+    """id постов, содержащих все основы запроса, по убыванию релевантности."""
+    if not query_terms:
+        return []
+    if use_fts5():
+        match = ' '.join(f'"{term}"' for term in query_terms)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                'ORDER BY rank LIMIT %s',
+                [match, limit],
+            )
+            return [post_id for post_id, in cursor.fetchall()]
+    matches = SearchTerm.objects.filter(term__in=query_terms)
+    frequencies = dict(
+        matches.order_by().values_list('term').annotate(Count('pk'))
+    )
+    if len(frequencies) < len(query_terms):
+        return []
+    # MAX(id) — дешёвая оценка числа постов без COUNT(*).
+    posts_total = Post.objects.aggregate(Max('pk'))['pk__max'] or 1
+    weight = Case(
+        *[
+            When(
+                term=term,
+                then=Value(math.log(1 + posts_total / frequency)),
+            )
+            for term, frequency in frequencies.items()
+        ],
+        output_field=FloatField(),
+    )
+    return list(
+        matches.order_by().values('post').annotate(
+            matched=Count('pk'),
+            score=Sum(ExpressionWrapper(
+                F('count') * weight, output_field=FloatField()
+            )),
+        ).filter(matched=len(query_terms)).order_by(
+            '-score', '-post'
+        ).values_list('post', flat=True)[:limit]
+    )
+
+
+def snippet(text, query_terms):
+    """Фрагмент текста вокруг первого совпадения с подсвеченными словами."""
+    words = list(WORD_RE.finditer(text))
+    if not words:
+        return escape(text)
+    matched = [
+        i for i, word in enumerate(words)
+        if normalize(word.group()) in query_terms
+    ]
+    first = max(matched[0] - SNIPPET_WORDS // 3, 0) if matched else 0
+    last = min(first + SNIPPET_WORDS, len(words))
+    start = words[first].start() if first else 0
+    end = words[last - 1].end() if last < len(words) else len(text)
+    parts = ['…'] if first else []
+    position = start
+    for i in matched:
+        if first <= i < last:
+            word = words[i]
+            parts.append(escape(text[position:word.start()]))
+            parts.append(f'<mark>{escape(word.group())}</mark>')
+            position = word.end()
+    parts.append(escape(text[position:end]))
+    if last < len(words):
+        parts.append('…')
+    return mark_safe(''.join(parts))
+
+
+def search_page(query, page_number):
+    """Страница найденных постов с подсвеченными фрагментами."""
+    query_terms = set(terms(query))
+    paginator = Paginator(
+        search_post_ids(query_terms, settings.SEARCH_MAX_RESULTS),
+        settings.MAX_PAGE_AMOUNT,
+    )
+    page = paginator.get_page(page_number)
+    posts = Post.objects.feed().in_bulk(page.object_list)
+    page.object_list = [
+        posts[post_id] for post_id in page.object_list if post_id in posts
+    ]
+    for post in page.object_list:
+        post.snippet = snippet(post.text, query_terms)
+    return page
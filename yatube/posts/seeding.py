@@ -0,0 +1,202 @@
+import io
+import itertools
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image
+
+from .activity import recount_group_activity
+from .bulk import create_posts
+from .counters import recount_comments, recount_user_stats
+from .models import Comment, Follow, Group, Post, User
+from .ranking import recount_hot
+
+BATCH_SIZE = 500
+PASSWORD = 'yatube-seed'
+PERIOD = timedelta(days=30)
+IMAGE_COLORS = ('#e63946', '#f1c453', '#2a9d8f', '#264653', '#8d99ae')
+WORDS = (
+    'город', 'утро', 'кофе', 'книга', 'дорога', 'море', 'поезд', 'музыка',
+    'работа', 'друзья', 'код', 'кот', 'дождь', 'лес', 'вечер', 'новости',
+)
+
+
+def zipf_weights(count, alpha):
+    """Накопленные веса степенного закона: вес i-го — 1 / (i + 1) ** alpha.
+
+    Первые пользователи получают большую часть подписок и постов, как
+    популярные авторы, остальные — длинный хвост.
+    """
+    return list(itertools.accumulate(
+        1 / (rank + 1) ** alpha for rank in range(count)
+    ))
+
+
+def batched(iterable, size=BATCH_SIZE):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def placeholder_images(prefix):
+    """Несколько однотонных картинок, общих для всех постов с картинкой."""
+    names = []
+    for number, color in enumerate(IMAGE_COLORS):
+        buffer = io.BytesIO()
+        Image.new('RGB', (960, 339), color).save(buffer, 'JPEG')
+        names.append(default_storage.save(
+            f'posts/{prefix}_{number}.jpg', ContentFile(buffer.getvalue())
+        ))
+    return names
+
+
+class Seeder:
+    """Синтетические данные, одинаковые при одном seed.
+
+    Подписки создаются до постов, чтобы create_posts разложил посты по
+    лентам. Число подписчиков и число постов распределены по степенному
+    закону независимо: иначе самые популярные авторы пишут больше всех, и
+    число записей в лентах растёт как квадрат популярности. Счётчики,
+    популярность и статистика групп пересчитываются в конце. Пароль всех
+    пользователей — PASSWORD, хеш считается один раз. Даты отсчитываются
+    от момента запуска.
+    """
+
+    def __init__(self, seed=0, prefix='seed', alpha=1.1, images=0.0,
+                 progress=None):
+        self.rng = random.Random(seed)
+        self.prefix = prefix
+        self.alpha = alpha
+        self.images = images
+        self.progress = progress or (lambda message: None)
+        self.now = timezone.now()
+
+    def run(self, users=100, groups=10, posts=10000, comments=10000,
+            follows=10):
+        self.step('Пользователи', self.create_users, users)
+        self.step('Группы', self.create_groups, groups)
+        self.step('Подписки', self.create_follows, follows)
+        self.step('Посты', self.create_posts, posts)
+        self.step('Комментарии', self.create_comments, comments)
+        self.step('Счётчики', self.recount)
+        return self.user_ids, self.group_ids
+
+    def step(self, name, method, *args):
+        started = time.perf_counter()
+        method(*args)
+        self.progress(f'{name}: {time.perf_counter() - started:.1f} с')
+
+    def pick_author(self, count=1, users=None):
+        return self.rng.choices(
+            users or self.user_ids, cum_weights=self.weights, k=count
+        )
+
+    def create_users(self, count):
+        password = make_password(PASSWORD)
+        for batch in batched(
+            User(username=f'{self.prefix}_user_{i}', password=password)
+            for i in range(count)
+        ):
+            User.objects.bulk_create(batch)
+        self.user_ids = list(User.objects.filter(
+            username__startswith=f'{self.prefix}_user_'
+        ).order_by('pk').values_list('pk', flat=True))
+        self.weights = zipf_weights(len(self.user_ids), self.alpha)
+        self.writers = self.rng.sample(self.user_ids, len(self.user_ids))
+
+    def create_groups(self, count):
+        Group.objects.bulk_create(
+            Group(
+                slug=f'{self.prefix}-{i}', title=f'Группа {i}', description=''
+            )
+            for i in range(count)
+        )
+        self.group_ids = list(Group.objects.filter(
+            slug__startswith=f'{self.prefix}-'
+        ).order_by('pk').values_list('pk', flat=True))
+
+    def create_follows(self, mean):
+        """Число подписок у читателя случайно со средним mean, авторы
+        выбираются по степенному закону."""
+        if not self.user_ids:
+            return
+        follows = (
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id in self.user_ids
+            for author_id in set(self.pick_author(
+                int(self.rng.expovariate(1 / mean)) if mean else 0
+            ))
+            if author_id != user_id
+        )
+        for batch in batched(follows):
+            Follow.objects.bulk_create(batch, ignore_conflicts=True)
+        # Тяжёлые авторы не раскладываются по лентам — нужны счётчики.
+        recount_user_stats()
+
+    def create_posts(self, count):
+        if not self.user_ids:
+            return
+        images = placeholder_images(self.prefix) if self.images else []
+        for batch in batched(range(count)):
+            authors = self.pick_author(len(batch), self.writers)
+            create_posts([
+                Post(
+                    text=self.text(number),
+                    author_id=author_id,
+                    group_id=(
+                        self.rng.choice(self.group_ids)
+                        if self.group_ids and self.rng.random() < 0.7
+                        else None
+                    ),
+                    image=(
+                        self.rng.choice(images)
+                        if images and self.rng.random() < self.images
+                        else ''
+                    ),
+                    pub_date=self.now - PERIOD * self.rng.random(),
+                )
+                for number, author_id in zip(batch, authors)
+            ], record_activity=False)
+
+    def create_comments(self, count):
+        post_ids = list(Post.objects.filter(
+            author_id__in=self.user_ids
+        ).values_list('pk', flat=True))
+        if not post_ids:
+            return
+        comments = (
+            Comment(
+                post_id=self.rng.choice(post_ids),
+                author_id=self.rng.choice(self.user_ids),
+                text=self.text(number),
+            )
+            for number in range(count)
+        )
+        for batch in batched(comments):
+            Comment.objects.bulk_create(batch)
+
+    def text(self, number):
+        words = self.rng.choices(WORDS, k=self.rng.randint(3, 30))
+        return f'{" ".join(words).capitalize()} #{number}'
+
+    def recount(self):
+        recount_comments()
+        recount_hot()
+        recount_group_activity()
+
+
+def seed(users=100, groups=10, posts=10000, comments=10000, follows=10,
+         seed=0, prefix='seed', **options):
+    """Заполняет базу синтетическими данными, см. Seeder."""
+    return Seeder(seed=seed, prefix=prefix, **options).run(
+        users=users, groups=groups, posts=posts, comments=comments,
+        follows=follows,
+    )
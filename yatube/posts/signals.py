@@ -0,0 +1,149 @@
+from contextvars import ContextVar
+
+from django.db.models import F
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import (activity, counters, fragments, ranking, search, thumbnails,
+               timeline)
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+# Посты, которые удаляются сейчас. Их комментарии удаляет каскад, и
+# статистика поста меняется один раз в post_deleting, а не на каждый
+# комментарий.
+deleting_posts = ContextVar('deleting_posts', default=frozenset())
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def post_ranked(sender, instance, **kwargs):
+    if instance._state.adding:
+        instance.hot = ranking.hot_score(
+            instance.pub_date or timezone.now(), instance.comments_count
+        )
+
+
+@receiver(pre_save, sender=Post)
+def post_versioned(sender, instance, **kwargs):
+    """Версия растёт в том же UPDATE, которым сохраняется пост.
+
+    Сохранение с update_fields без version её не меняет. Новое значение
+    перечитывает post_saved.
+    """
+    if not instance._state.adding:
+        instance.version = F('version') + 1
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user_stats(instance.author_id, posts_count=1)
+        timeline.fan_out(instance)
+        activity.record_posts([instance])
+    else:
+        # Вместо F-выражения из post_versioned.
+        instance.refresh_from_db(fields=['version'])
+    if instance.image:
+        thumbnails.schedule(instance)
+    search.index_post(instance)
+    fragments.bump_post_versions([instance.author_id], [instance.group_id])
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    deleting_posts.set(deleting_posts.get() | {instance.pk})
+    if instance.group_id:
+        activity.remove_comments(
+            instance.group_id, activity.comment_buckets(instance.pk)
+        )
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    deleting_posts.set(deleting_posts.get() - {instance.pk})
+    counters.change_user_stats(instance.author_id, posts_count=-1)
+    search.remove_post(instance.pk)
+    if instance.group_id:
+        activity.change_activity(
+            instance.group_id, instance.pub_date, posts_count=-1
+        )
+        activity.refresh_author(instance.group_id, instance.author_id)
+    # Главная не сбрасывается: удалённый пост уходит с неё вместе с
+    # кэшем страницы.
+    fragments.bump_post_versions(
+        [instance.author_id], [instance.group_id], feed=False
+    )
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    """Карточки постов показывают группу: их версии растут вместе с ней.
+
+    При удалении версии меняются заранее: group у постов обнуляет
+    каскад, в обход сигналов.
+    """
+    instance.posts.update(version=F('version') + 1)
+    fragments.bump_post_versions(
+        instance.posts.order_by().values_list('author', flat=True).distinct(),
+        [instance.pk],
+    )
+
+
+def comment_post(comment):
+    """Автор и группа поста комментария; пост не загружается, если его
+    нет."""
+    if Comment.post.is_cached(comment):
+        return comment.post.author_id, comment.post.group_id
+    return Post.objects.filter(pk=comment.post_id).values_list(
+        'author_id', 'group_id'
+    ).first() or (None, None)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        counters.change_comments_count(instance.post_id, 1)
+        author_id, group_id = comment_post(instance)
+        if group_id:
+            activity.change_activity(
+                group_id, instance.created, comments_count=1
+            )
+        fragments.bump_post_versions([author_id], [group_id])
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.post_id in deleting_posts.get():
+        return
+    counters.change_comments_count(instance.post_id, -1)
+    author_id, group_id = comment_post(instance)
+    if group_id:
+        activity.change_activity(
+            group_id, instance.created, comments_count=-1
+        )
+    fragments.bump_post_versions([author_id], [group_id])
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user_stats(instance.user_id, following_count=1)
+        counters.change_user_stats(instance.author_id, followers_count=1)
+        timeline.backfill(instance.user_id, instance.author_id)
+        fragments.bump_user_versions(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_user_stats(instance.user_id, following_count=-1)
+    counters.change_user_stats(instance.author_id, followers_count=-1)
+    timeline.prune(instance.user_id, instance.author_id)
+    fragments.bump_user_versions(instance.user_id, instance.author_id)
@@ -0,0 +1,10 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.inclusion_tag('posts/includes/card_picture.html')
+def card_picture(post):
+    return {'picture': thumbnails.card_picture(post)}
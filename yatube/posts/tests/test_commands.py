@@ -0,0 +1,316 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+from contextlib import nullcontext
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from ..bulk import create_posts
+from ..export import FORMATS, export_lines
+from ..management.commands import loadtest
+from ..models import (Follow, Group, GroupActivity, Post, TimelineEntry,
+                      UserStats)
+from ..search import search_page
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class RecountStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+
+    def test_recount_stats_repairs_drift(self):
+        """Команда recount_stats исправляет разошедшиеся счётчики."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        post.comments.create(author=self.user, text='Комментарий')
+        Post.objects.update(comments_count=10)
+        UserStats.objects.filter(user=self.author).delete()
+
+        call_command('recount_stats', stdout=StringIO())
+
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 1
+        )
+
+    def test_recount_stats_rebuilds_group_activity(self):
+        group = Group.objects.create(title='Классика', slug='classic')
+        post = Post.objects.create(
+            author=self.author, group=group, text='Пост'
+        )
+        post.comments.create(author=self.user, text='Комментарий')
+        before = sorted(GroupActivity.objects.values_list(
+            'group', 'bucket', 'posts_count', 'comments_count'
+        ))
+        GroupActivity.objects.update(posts_count=0)
+        call_command('recount_stats', stdout=StringIO())
+        self.assertEqual(sorted(GroupActivity.objects.values_list(
+            'group', 'bucket', 'posts_count', 'comments_count'
+        )), before)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImportPostsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='leo')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.group = Group.objects.create(
+            title='Классика', slug='classic', description=''
+        )
+        cls.source = tempfile.mkdtemp()
+        with open(os.path.join(cls.source, 'pic.gif'), 'wb') as image:
+            image.write(
+                b'\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00\x00\x00'
+                b'\x00\x21\xF9\x04\x00\x00\x00\x00\x00\x2C\x00\x00'
+                b'\x00\x00\x01\x00\x01\x00\x00\x02\x00\x3B'
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.source, ignore_errors=True)
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def import_rows(self, rows, **options):
+        path = os.path.join(self.source, 'posts.jsonl')
+        with open(path, 'w', encoding='utf-8') as file:
+            for row in rows:
+                file.write(json.dumps(row, ensure_ascii=False) + '\n')
+        err = StringIO()
+        call_command(
+            'import_posts', path, images_dir=self.source,
+            stdout=StringIO(), stderr=err, **options
+        )
+        return err.getvalue()
+
+    def test_import_keeps_side_effects(self):
+        """Импорт пачками обновляет счётчики, ленты и поиск."""
+        errors = self.import_rows(
+            [
+                {
+                    'author': 'leo', 'group': 'classic',
+                    'text': 'Война и мир', 'pub_date': '1869-01-01T00:00',
+                    'image': 'pic.gif',
+                },
+                {'author': 'leo', 'text': 'Анна Каренина'},
+                {'author': 'leo', 'text': 'Воскресение'},
+                {'author': 'nobody', 'text': 'Пост'},
+            ],
+            batch_size=2,
+        )
+        self.assertIn('Строка 4', errors)
+        self.assertEqual(Post.objects.count(), 3)
+        post = Post.objects.get(text='Война и мир')
+        self.assertEqual(post.pub_date.year, 1869)
+        self.assertEqual(post.group, self.group)
+        self.assertTrue(post.image.storage.exists(post.image.name))
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 3
+        )
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 3
+        )
+        self.assertEqual(list(search_page('мира', None)), [post])
+
+    def test_create_posts_keeps_dates_and_ids(self):
+        """Пачка получает свои даты и id после всех выданных ранее."""
+        deleted_pk = Post.objects.create(author=self.author, text='').pk
+        Post.objects.filter(pk=deleted_pk).delete()
+        month_ago = timezone.now() - timedelta(days=30)
+        old, new = create_posts([
+            Post(author=self.author, text='Старый', pub_date=month_ago),
+            Post(author=self.author, text='Новый'),
+        ])
+        self.assertGreater(old.pk, deleted_pk)
+        self.assertEqual(Post.objects.get(pk=old.pk).pub_date, month_ago)
+        self.assertEqual(Post.objects.get(pk=new.pk).text, 'Новый')
+        self.assertTrue(Post._meta.get_field('pub_date').auto_now_add)
+
+    def test_create_missing_authors_and_groups(self):
+        self.import_rows(
+            [{'author': 'new', 'group': 'new-group', 'text': 'Пост'}],
+            create_missing=True,
+        )
+        post = Post.objects.get()
+        self.assertEqual(post.author.username, 'new')
+        self.assertEqual(post.group.slug, 'new-group')
+        self.assertEqual(post.author.stats.posts_count, 1)
+
+
+class ExportDataTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='leo')
+        cls.group = Group.objects.create(
+            title='Классика', slug='classic', description=''
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Глава\n{i}'
+            )
+            for i in range(3)
+        ]
+        cls.directory = tempfile.mkdtemp()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.directory, ignore_errors=True)
+
+    def export(self, *args, **options):
+        err = StringIO()
+        call_command('export_data', *args, stderr=err, **options)
+        return err.getvalue()
+
+    def test_export_imports_back(self):
+        """Выгрузка постов читается командой import_posts."""
+        path = os.path.join(self.directory, 'posts.jsonl')
+        self.export('posts', output=path)
+        Post.objects.all().delete()
+        call_command('import_posts', path, stdout=StringIO())
+        self.assertEqual(
+            list(Post.objects.order_by('pub_date').values_list(
+                'text', 'group__slug', 'pub_date'
+            )),
+            [(post.text, 'classic', post.pub_date) for post in self.posts],
+        )
+
+    def test_resume_continues_after_last_row(self):
+        """--resume дописывает файл после последней выгруженной строки."""
+        path = os.path.join(self.directory, 'posts.csv')
+        with open(path, 'w', newline='', encoding='utf-8') as file:
+            file.writelines(list(export_lines('posts', 'csv'))[:3])
+        errors = self.export('posts', format='csv', output=path, resume=True)
+        self.assertIn(f'после id {self.posts[1].pk}', errors)
+        with open(path, newline='', encoding='utf-8') as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual(
+            [int(row['id']) for row in rows],
+            [post.pk for post in self.posts],
+        )
+        self.assertEqual(rows[0]['text'], 'Глава\n0')
+
+    def test_resume_replaces_cut_off_record(self):
+        """--resume отрезает оборванную запись и выгружает её заново."""
+        for format in FORMATS:
+            with self.subTest(format=format):
+                path = os.path.join(self.directory, f'cut.{format}')
+                content = ''.join(export_lines('posts', format))
+                # Обрыв внутри текста последнего поста.
+                cut = content.rindex('Глава') + len('Глава') + 1
+                with open(path, 'w', newline='', encoding='utf-8') as file:
+                    file.write(content[:cut])
+                self.export('posts', format=format, output=path, resume=True)
+                with open(path, newline='', encoding='utf-8') as file:
+                    if format == 'csv':
+                        rows = list(csv.DictReader(file))
+                    else:
+                        rows = [json.loads(line) for line in file]
+                self.assertEqual(
+                    [int(row['id']) for row in rows],
+                    [post.pk for post in self.posts],
+                )
+                self.assertEqual(rows[-1]['text'], 'Глава\n2')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedCommandTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def seed(self, **options):
+        call_command(
+            'seed', users=60, groups=3, posts=300, comments=200, follows=8,
+            stdout=StringIO(), **options
+        )
+
+    def test_seed_creates_consistent_data(self):
+        self.seed(images=0.5)
+        self.assertEqual(User.objects.count(), 60)
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertEqual(Group.objects.count(), 3)
+        author = User.objects.get(username='seed_user_0')
+        self.assertTrue(author.check_password('yatube-seed'))
+        # Степенной закон: у первого автора подписчиков больше среднего.
+        followers = list(UserStats.objects.order_by(
+            '-followers_count'
+        ).values_list('followers_count', flat=True))
+        self.assertGreater(followers[0], 3 * sum(followers) / 60)
+        self.assertEqual(author.stats.followers_count,
+                         Follow.objects.filter(author=author).count())
+        post = Post.objects.exclude(image='').first()
+        self.assertTrue(os.path.exists(post.image.path))
+        self.assertEqual(
+            sum(Post.objects.values_list('comments_count', flat=True)), 200
+        )
+        self.assertTrue(TimelineEntry.objects.exists())
+        self.assertTrue(GroupActivity.objects.exists())
+
+    def test_seed_is_deterministic(self):
+        def snapshot():
+            return (
+                list(Post.objects.order_by('pk').values_list(
+                    'author__username', 'group__slug', 'text'
+                )),
+                sorted(Follow.objects.values_list(
+                    'user__username', 'author__username'
+                )),
+            )
+        self.seed(seed=7)
+        first = snapshot()
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+        User.objects.all().delete()
+        self.seed(seed=7)
+        self.assertEqual(snapshot(), first)
+
+
+@override_settings(THUMBNAIL_WORKERS=0)
+class LoadTestCommandTest(TransactionTestCase):
+    def test_report_per_endpoint(self):
+        """Нагрузочный замер пишет отчёт по каждой странице."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        output = os.path.join(directory, 'report.json')
+        # Базу в памяти тестов не подменить на файл: замер идёт в ней.
+        with mock.patch.object(
+            loadtest.Command, 'isolated', lambda self, directory: nullcontext()
+        ):
+            call_command(
+                'loadtest', users=5, groups=2, posts=20, comments=20,
+                follows=2, requests=4, concurrency=1, output=output,
+                stdout=StringIO(),
+            )
+        with open(output, encoding='utf-8') as file:
+            report = json.load(file)
+        self.assertEqual(report['meta']['options']['posts'], 20)
+        self.assertEqual(
+            list(report['endpoints']),
+            [name for name, *_ in loadtest.ENDPOINTS],
+        )
+        for name, result in report['endpoints'].items():
+            with self.subTest(name=name):
+                self.assertEqual(result['requests'], 4)
+                self.assertEqual(result['errors'], 0)
+                self.assertGreater(result['queries_mean'], 0)
+                self.assertGreater(result['peak_traced_kb'], 0)
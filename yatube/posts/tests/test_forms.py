@@ -2,19 +2,23 @@ import shutil
 import tempfile
 
 from http import HTTPStatus
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
+from .. import views
 from ..forms import CommentForm
 from ..models import Comment, Group, Post
 
 User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class PostModelTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -43,12 +47,11 @@ class PostModelTest(TestCase):
             content=cls.small_gif,
             content_type='image/gif'
         )
-        settings.MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
     @classmethod
     def tearDownClass(cls):
         super().tearDownClass()
-        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
         self.guest_user = Client()
@@ -114,6 +117,28 @@ class PostModelTest(TestCase):
         self.assertTrue(post.author == self.user)
         self.assertTrue(post.group_id == form_data['group'])
 
+    def test_post_edit_keeps_counters(self):
+        """Правка не затирает счётчики, изменённые после загрузки поста"""
+        post = Post.objects.create(author=self.user, text='Текст поста')
+        load_post = views.get_object_or_404
+
+        def load_and_comment(*args, **kwargs):
+            loaded = load_post(*args, **kwargs)
+            Comment.objects.create(
+                post=post, author=self.user, text='Комментарий'
+            )
+            return loaded
+
+        with mock.patch.object(views, 'get_object_or_404', load_and_comment):
+            self.authorized_client.post(
+                reverse('posts:post_edit', args=[post.id]),
+                data={'text': 'Новый текст'},
+            )
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Новый текст')
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.version, 2)
+
     def test_guest_user_create_post(self):
         """проверка создания записи неавторизованным пользователем"""
         posts_count = Post.objects.count()
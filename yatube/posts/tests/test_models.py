@@ -1,7 +1,15 @@
+from datetime import timedelta
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
 
-from ..models import Group, Post
+from ..activity import WINDOWS, trending_groups, with_stats
+from ..bulk import create_posts
+from ..models import Group, Post, UserStats
 
 User = get_user_model()
 
@@ -64,3 +72,153 @@ class GroupModelTest(TestCase):
         group = GroupModelTest.group
         expected_object_name = group.title
         self.assertEqual(expected_object_name, str(group))
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются при постах, комментариях и подписках."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+
+        self.authorized_client.post(
+            reverse('posts:add_comment', args=[post.id]),
+            {'text': 'Комментарий'},
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+        self.authorized_client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.user).following_count, 1)
+
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.user).following_count, 0)
+
+        post.comments.all().delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        post.delete()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+
+    def test_save_bumps_current_version(self):
+        """Сохранение поста увеличивает версию, а не пишет старую, и
+        сохранённый пост знает новую версию."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        post.comments.create(author=self.user, text='Комментарий')
+        post.text = 'Новый текст'
+        post.save()
+        self.assertEqual(post.version, 2)
+        post.refresh_from_db()
+        self.assertEqual(post.version, 2)
+
+
+class GroupActivityTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='leo')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Классика', slug='classic', description=''
+        )
+        cls.quiet = Group.objects.create(
+            title='Тишина', slug='quiet', description=''
+        )
+
+    def stats(self, group):
+        return with_stats(Group.objects.filter(pk=group.pk)).values(
+            *(f'{name}_{window}' for name in ('posts', 'comments', 'authors')
+              for window in WINDOWS)
+        ).get()
+
+    def test_writes_update_buckets(self):
+        """Посты и комментарии сразу попадают в статистику группы."""
+        now = timezone.now()
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост'
+        )
+        post.comments.create(author=self.reader, text='Комментарий')
+        create_posts([
+            Post(author=self.reader, group=self.group, text='Старый',
+                 pub_date=now - timedelta(days=3)),
+            Post(author=self.author, group=self.quiet, text='Давний',
+                 pub_date=now - timedelta(days=30)),
+        ])
+        self.assertEqual(self.stats(self.group), {
+            'posts_hour': 1, 'posts_day': 1, 'posts_week': 2,
+            'comments_hour': 1, 'comments_day': 1, 'comments_week': 1,
+            'authors_hour': 1, 'authors_day': 1, 'authors_week': 2,
+        })
+        self.assertEqual(self.stats(self.quiet)['posts_week'], 0)
+        post.delete()
+        stats = self.stats(self.group)
+        self.assertEqual(
+            (stats['posts_day'], stats['comments_day'], stats['authors_day'],
+             stats['authors_week']),
+            (0, 0, 0, 1),
+        )
+
+    def test_post_delete_queries_do_not_grow_with_comments(self):
+        """Каскад комментариев не загружает пост на каждый комментарий."""
+        queries = []
+        for comments in (1, 5):
+            post = Post.objects.create(
+                author=self.author, group=self.group, text='Пост'
+            )
+            for number in range(comments):
+                post.comments.create(author=self.reader, text=f'{number}')
+            with CaptureQueriesContext(connection) as context:
+                post.delete()
+            queries.append(len(context))
+        self.assertEqual(queries[0], queries[1])
+        self.assertEqual(self.stats(self.group)['comments_day'], 0)
+
+    def test_edit_moves_post_to_new_group(self):
+        """Смена группы переносит пост и его комментарии в статистике."""
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост'
+        )
+        post.comments.create(author=self.reader, text='Комментарий')
+        client = Client()
+        client.force_login(self.author)
+        client.post(
+            reverse('posts:post_edit', args=[post.pk]),
+            {'text': 'Пост', 'group': self.quiet.pk},
+        )
+        for group, count in ((self.group, 0), (self.quiet, 1)):
+            with self.subTest(group=group.slug):
+                stats = self.stats(group)
+                self.assertEqual(
+                    (stats['posts_day'], stats['comments_day'],
+                     stats['authors_day']),
+                    (count, count, count),
+                )
+
+    def test_trending(self):
+        posts = [
+            Post.objects.create(author=self.author, group=group, text='Пост')
+            for group in (self.group, self.quiet, self.quiet)
+        ]
+        posts[0].comments.create(author=self.reader, text='Первый')
+        self.assertEqual(
+            [(group, group.score) for group in trending_groups()],
+            [(self.quiet, 6), (self.group, 4)],
+        )
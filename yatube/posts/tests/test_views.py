@@ -1,19 +1,37 @@
+import base64
+import json
 import shutil
 import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.cache import cache
+from django.core.cache import cache, caches
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase, Client
+from django.core.management import call_command
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
 
-
-from ..models import Group, Post
+from .. import thumbnails
+from ..bulk import create_posts
+from ..explain import feed_queries, query_plan, uses_temp_sort
+from ..fragments import FEED_VERSION_KEY
+from ..models import Follow, Group, Post, TimelineEntry
+from ..ranking import hot_score
 
 User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
 
+def raw_cursor(*position):
+    """Курсор с произвольным содержимым, как его мог бы подделать клиент."""
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
 
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class StaticURLTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -43,12 +61,11 @@ class StaticURLTests(TestCase):
             group=cls.group,
             image=uploaded,
         )
-        settings.MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
     @classmethod
     def tearDownClass(cls):
         super().tearDownClass()
-        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
         self.authorized_client = Client()
@@ -198,7 +215,9 @@ class PaginatorViewsTest(TestCase):
         Post.objects.bulk_create(post_list)
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
 
     def test_paginator_pages(self):
         POST_ON_FIRST_PAGE = settings.MAX_PAGE_AMOUNT
@@ -229,3 +248,694 @@ class PaginatorViewsTest(TestCase):
                 list_test = response.context['page_obj']
                 list_test.paginator.count
                 self.assertEqual(POST_ON_FIRST_PAGE, len(list_test))
+
+    def test_cursor_pages(self):
+        """Переход по курсорам отдаёт следующую и предыдущую страницы."""
+        response = self.authorized_client.get(reverse('posts:index'))
+        first_page = response.context['page_obj']
+        self.assertIsNone(first_page.previous_cursor)
+        self.assertIsNotNone(first_page.next_cursor)
+
+        response = self.authorized_client.get(
+            reverse('posts:index'), {'cursor': first_page.next_cursor}
+        )
+        second_page = response.context['page_obj']
+        self.assertEqual(13 - settings.MAX_PAGE_AMOUNT, len(second_page))
+        self.assertIsNone(second_page.next_cursor)
+        self.assertFalse(
+            set(second_page.object_list) & set(first_page.object_list)
+        )
+
+        response = self.authorized_client.get(
+            reverse('posts:index'), {'cursor': second_page.previous_cursor}
+        )
+        self.assertEqual(
+            list(response.context['page_obj']), list(first_page)
+        )
+        self.assertIsNone(response.context['page_obj'].previous_cursor)
+
+    def test_broken_cursor_returns_first_page(self):
+        """Испорченный курсор отдаёт первую страницу."""
+        response = self.authorized_client.get(
+            reverse('posts:index'), {'cursor': 'broken'}
+        )
+        self.assertEqual(
+            settings.MAX_PAGE_AMOUNT, len(response.context['page_obj'])
+        )
+
+    def test_cursor_of_wrong_type_returns_first_page(self):
+        """Число вместо даты в курсоре ленты — тоже первая страница."""
+        for value in (1.5, 7, True):
+            with self.subTest(value=value):
+                response = self.authorized_client.get(
+                    reverse('posts:index'),
+                    {'cursor': raw_cursor(value, 1, False)},
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertIsNone(
+                    response.context['page_obj'].previous_cursor
+                )
+
+
+class FollowTimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.old_post = Post.objects.create(author=cls.author, text='Старый')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def get_feed(self):
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_timeline_follow_post_unfollow(self):
+        """Лента подписок дополняется, пополняется и очищается."""
+        self.authorized_client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        self.assertEqual(self.get_feed(), [self.old_post])
+
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.user, post=new_post)
+        )
+        self.assertEqual(self.get_feed(), [new_post, self.old_post])
+
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        self.assertFalse(TimelineEntry.objects.filter(user=self.user))
+        self.assertEqual(self.get_feed(), [])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_heavy_author_read_on_demand(self):
+        """Посты тяжёлых авторов подмешиваются в ленту при чтении."""
+        Follow.objects.create(user=self.user, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertFalse(TimelineEntry.objects.filter(user=self.user))
+        self.assertEqual(self.get_feed(), [new_post, self.old_post])
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'writer{i}') for i in range(3)
+        ]
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.authors[i % 3], group=cls.group, text=str(i))
+            for i in range(13)
+        )
+        for post in Post.objects.all():
+            post.comments.create(author=cls.user, text='Комментарий')
+        for author in cls.authors:
+            Follow.objects.create(user=cls.user, author=author)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_feed_query_count(self):
+        """Число запросов на страницу ленты не зависит от числа постов."""
+        pages = {
+            reverse('posts:index'): 2,
+            reverse('posts:popular'): 2,
+            reverse('posts:group_list', args=[self.group.slug]): 4,
+            reverse('posts:profile', args=[self.authors[0].username]): 4,
+            reverse('posts:follow_index'): 4,
+        }
+        for url, queries in pages.items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(queries):
+                    response = self.authorized_client.get(url)
+                self.assertEqual(
+                    response.context['page_obj'][0].comments_count, 1
+                )
+
+    def test_feed_queries_use_indexes(self):
+        """Страницы лент читаются по индексу, без сортировки в памяти."""
+        post = Post.objects.first()
+        positions = [None, (post.pub_date, post.pk, False)]
+        for position in positions:
+            queries = feed_queries(
+                self.authors[0], self.group, post, position
+            )
+            for name, queryset in queries.items():
+                with self.subTest(name=name, position=position):
+                    self.assertFalse(uses_temp_sort(query_plan(queryset)))
+
+    def test_benchmark_rolls_back(self):
+        """Замер лент не оставляет тестовых данных в базе."""
+        posts = Post.objects.count()
+        out = StringIO()
+        call_command(
+            'benchmark_feeds', posts=50, comments=5, repeat=1, stdout=out
+        )
+        self.assertIn('середина ленты', out.getvalue())
+        self.assertEqual(Post.objects.count(), posts)
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Старый текст')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_card_served_from_cache(self):
+        """Карточка поста берётся из кэша, пока версия не изменилась."""
+        url = reverse('posts:profile', args=[self.user.username])
+        self.authorized_client.get(url)
+        Post.objects.filter(pk=self.post.pk).update(text='Новый текст')
+        response = self.authorized_client.get(url)
+        self.assertContains(response, 'Старый текст')
+
+    def test_edit_and_comment_invalidate_card(self):
+        """Правка и комментарий сразу видны в лентах."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', args=[self.user.username]),
+        )
+        for url in urls:
+            self.authorized_client.get(url)
+        self.authorized_client.post(
+            reverse('posts:post_edit', args=[self.post.pk]),
+            {'text': 'Новый текст'},
+        )
+        self.authorized_client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'Комментарий'},
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertContains(response, 'Новый текст')
+                self.assertContains(response, 'Комментариев: 1')
+
+    def test_group_change_invalidates_card(self):
+        """Новое название и удаление группы сразу видны в карточке."""
+        group = Group.objects.create(title='Старая группа', slug='old')
+        Post.objects.filter(pk=self.post.pk).update(group=group)
+        url = reverse('posts:profile', args=[self.user.username])
+        self.assertContains(self.authorized_client.get(url), 'Старая группа')
+        group.title = 'Новая группа'
+        group.save()
+        self.assertContains(self.authorized_client.get(url), 'Новая группа')
+        group.delete()
+        self.assertNotContains(self.authorized_client.get(url), 'Новая группа')
+
+    def test_fragments_use_own_alias(self):
+        """Фрагменты лежат в алиасе fragments и сбрасываются общим clear."""
+        self.authorized_client.get(reverse('posts:index'))
+        self.assertIsNotNone(caches['fragments'].get(FEED_VERSION_KEY))
+        self.assertIsNone(cache.get(FEED_VERSION_KEY))
+        cache.clear()
+        self.assertIsNone(caches['fragments'].get(FEED_VERSION_KEY))
+
+
+@override_settings(COMMENTS_PAGE_AMOUNT=10)
+class PostDetailCommentsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        cls.comments = [
+            cls.post.comments.create(author=cls.user, text=str(i))
+            for i in range(13)
+        ]
+        cls.url = reverse('posts:post_detail', args=[cls.post.pk])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_detail_query_count(self):
+        """Версия поста, пост и страница комментариев — три запроса."""
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertEqual(response.context['post'].author.stats.posts_count, 1)
+        self.assertContains(response, 'Комментариев: 13')
+
+    def test_comments_load_more(self):
+        """Комментарии выводятся страницами от новых к старым."""
+        response = self.client.get(self.url)
+        first_page = response.context['comments']
+        self.assertEqual(
+            list(first_page), self.comments[::-1][:10]
+        )
+        self.assertIsNone(first_page.previous_cursor)
+        response = self.client.get(
+            self.url, {'cursor': first_page.next_cursor}
+        )
+        second_page = response.context['comments']
+        self.assertEqual(list(second_page), self.comments[::-1][10:])
+        self.assertIsNone(second_page.next_cursor)
+        self.assertContains(response, 'К новым')
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def revalidate(self, client, url):
+        """Повторный запрос с валидаторами из первого ответа."""
+        response = client.get(url)
+        return client.get(
+            url,
+            HTTP_IF_NONE_MATCH=response['ETag'],
+            HTTP_IF_MODIFIED_SINCE=response.get('Last-Modified', ''),
+        )
+
+    def test_unchanged_pages_not_modified(self):
+        """Неизменная страница отдаётся как 304 без загрузки постов."""
+        urls = {
+            reverse('posts:index'): 0,
+            reverse('posts:group_list', args=[self.group.slug]): 1,
+            reverse('posts:profile', args=[self.author.username]): 1,
+            reverse('posts:post_detail', args=[self.post.pk]): 1,
+        }
+        for url, queries in urls.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn('public', response['Cache-Control'])
+                with self.assertNumQueries(queries):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                self.assertEqual(response.status_code, 304)
+
+    def test_changes_invalidate_validators(self):
+        """Новые посты, комментарии и подписки меняют ETag."""
+        changes = {
+            reverse('posts:index'): lambda: Post.objects.create(
+                author=self.author, text='Новый пост'
+            ),
+            reverse('posts:post_detail', args=[self.post.pk]): (
+                lambda: self.post.comments.create(
+                    author=self.user, text='Комментарий'
+                )
+            ),
+            reverse('posts:follow_index'): lambda: Follow.objects.create(
+                user=self.user, author=self.author
+            ),
+        }
+        for url, change in changes.items():
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertIn('private', response['Cache-Control'])
+                change()
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_group_changes_post_etag(self):
+        """Страница поста показывает группу: её правка меняет ETag."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        etag = self.client.get(url)['ETag']
+        Group.objects.filter(pk=self.group.pk).update(title='Новая группа')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Новая группа')
+
+    def test_etag_depends_on_user_and_page(self):
+        url = reverse('posts:index')
+        etags = {
+            self.client.get(url)['ETag'],
+            self.authorized_client.get(url)['ETag'],
+            self.client.get(url, {'page': 2})['ETag'],
+        }
+        self.assertEqual(len(etags), 3)
+        response = self.revalidate(self.authorized_client, url)
+        self.assertEqual(response.status_code, 304)
+
+    def test_new_login_changes_etag(self):
+        """После нового входа форма комментария приходит с новым
+        CSRF-токеном, а не как 304 со старым."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        etag = self.authorized_client.get(url)['ETag']
+        self.assertEqual(
+            self.authorized_client.get(
+                url, HTTP_IF_NONE_MATCH=etag
+            ).status_code,
+            304,
+        )
+        self.authorized_client.logout()
+        self.authorized_client.force_login(self.user)
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_anonymous_page_served_from_cache(self):
+        """Повторная страница для анонима не рендерится заново."""
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        self.assertIsNotNone(response.context)
+        with self.assertNumQueries(0):
+            cached = self.client.get(url)
+        self.assertIsNone(cached.context)
+        self.assertEqual(cached.content, response.content)
+        response = self.client.get(url, {'page': 2})
+        self.assertIsNotNone(response.context)
+
+    def test_authenticated_bypass_cache(self):
+        url = reverse('posts:index')
+        self.client.get(url)
+        for _ in range(2):
+            response = self.authorized_client.get(url)
+            self.assertIsNotNone(response.context)
+            self.assertContains(response, self.user.username)
+
+    def test_changes_purge_pages(self):
+        """Посты, комментарии и подписки сразу видны анонимам."""
+        changes = {
+            reverse('posts:index'): (
+                lambda: Post.objects.create(
+                    author=self.author, text='Новый пост'
+                ),
+                'Новый пост',
+            ),
+            reverse('posts:post_detail', args=[self.post.pk]): (
+                lambda: self.post.comments.create(
+                    author=self.user, text='Новый комментарий'
+                ),
+                'Новый комментарий',
+            ),
+            reverse('posts:profile', args=[self.author.username]): (
+                lambda: Follow.objects.create(
+                    user=self.user, author=self.author
+                ),
+                'Подписчиков: 1',
+            ),
+        }
+        for url, (change, text) in changes.items():
+            with self.subTest(url=url):
+                self.assertNotContains(self.client.get(url), text)
+                change()
+                self.assertContains(self.client.get(url), text)
+
+    def test_changes_purge_only_affected_pages(self):
+        """Новый пост сбрасывает страницы своих автора и группы, а чужие
+        остаются в кэше."""
+        groups = [
+            Group.objects.create(title=f'Группа {i}', slug=f'group_{i}')
+            for i in range(2)
+        ]
+        other = User.objects.create_user(username='other')
+        pages = {
+            reverse('posts:group_list', args=[groups[0].slug]): True,
+            reverse('posts:profile', args=[self.author.username]): True,
+            reverse('posts:group_list', args=[groups[1].slug]): False,
+            reverse('posts:profile', args=[other.username]): False,
+        }
+        for url in pages:
+            self.client.get(url)
+        post = Post.objects.create(
+            author=self.author, group=groups[0], text='Новый пост'
+        )
+        for url, purged in pages.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.context is not None, purged)
+        self.authorized_client.force_login(self.author)
+        self.authorized_client.post(
+            reverse('posts:post_edit', args=[post.pk]),
+            {'text': 'Новый пост', 'group': groups[1].pk},
+        )
+        for group in groups:
+            with self.subTest(group=group.slug):
+                response = self.client.get(
+                    reverse('posts:group_list', args=[group.slug])
+                )
+                self.assertIsNotNone(response.context)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class CardThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        # Уже самой широкой карточки: варианты 960 и 1920 не нужны.
+        image = BytesIO()
+        Image.new('RGB', (700, 400), 'teal').save(image, 'JPEG')
+        cls.post = Post.objects.create(
+            text='Текст поста',
+            author=cls.user,
+            image=SimpleUploadedFile(
+                name='card.jpg',
+                content=image.getvalue(),
+                content_type='image/jpeg'
+            ),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_original_image_until_thumbnail_ready(self):
+        """Пока вариантов нет, карточка показывает исходную картинку."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        response = self.client.get(url)
+        self.assertContains(response, self.post.image.url)
+
+        thumbnails.generate(self.post.pk, self.post.image.name)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.version, 1)
+
+        response = self.client.get(url)
+        self.assertNotContains(response, self.post.image.url)
+        self.assertContains(response, 'type="image/webp"')
+        for width in (320, 640):
+            with self.subTest(width=width):
+                self.assertContains(response, f'.jpg {width}w', 1)
+                self.assertContains(response, f'.webp {width}w', 1)
+        self.assertNotContains(response, ' 960w')
+        self.assertNotContains(response, ' 1920w')
+
+
+class SearchViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.milk = Post.objects.create(
+            author=cls.user, text='Кошки любят молоко.'
+        )
+        cls.walk = Post.objects.create(
+            author=cls.user, text='Собака гуляет с кошкой, кошка рада.'
+        )
+        cls.dogs = Post.objects.create(author=cls.user, text='Про собак.')
+
+    def search(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return response, list(response.context['page_obj'])
+
+    def test_search_stems_and_ranks(self):
+        """Поиск находит словоформы и ставит выше частые совпадения."""
+        response, posts = self.search('кошка')
+        self.assertEqual(posts, [self.walk, self.milk])
+        self.assertContains(response, '<mark>Кошки</mark>')
+
+        _, posts = self.search('кошками молоко')
+        self.assertEqual(posts, [self.milk])
+
+    def test_edit_updates_index(self):
+        """Правка поста сразу попадает в индекс."""
+        self.dogs.text = 'Про собак и кошку.'
+        self.dogs.save()
+        _, posts = self.search('кошки')
+        self.assertIn(self.dogs, posts)
+        Post.objects.filter(pk=self.milk.pk).delete()
+        _, posts = self.search('молоко')
+        self.assertEqual(posts, [])
+
+
+@override_settings(SEARCH_BACKEND='table')
+class TableSearchViewTest(SearchViewTest):
+    pass
+
+
+class ExportViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='leo')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=f'Пост {i}')
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_export_is_staff_only(self):
+        url = reverse('posts:export_data', args=['posts'])
+        self.client.force_login(self.author)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)
+
+    def test_export_streams_rows_after_checkpoint(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(
+            reverse('posts:export_data', args=['posts']),
+            {'after': self.posts[0].pk},
+        )
+        self.assertTrue(response.streaming)
+        rows = [
+            json.loads(line)
+            for line in b''.join(response.streaming_content).splitlines()
+        ]
+        self.assertEqual(
+            [row['id'] for row in rows], [post.pk for post in self.posts[1:]]
+        )
+        self.assertEqual(rows[0]['author'], 'leo')
+
+    def test_export_csv_and_unknown_dataset(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(
+            reverse('posts:export_data', args=['follows']), {'format': 'csv'}
+        )
+        self.assertEqual(
+            b''.join(response.streaming_content), b'id,user,author\r\n'
+        )
+        response = self.client.get(
+            reverse('posts:export_data', args=['users'])
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class TrendingViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='leo')
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {i}', slug=f'group-{i}', description=''
+            )
+            for i in range(3)
+        ]
+        for group, count in zip(cls.groups, (1, 2, 0)):
+            for _ in range(count):
+                Post.objects.create(
+                    author=cls.author, group=group, text='Пост'
+                )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_trending_lists_active_groups(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('posts:trending'))
+        self.assertEqual(
+            list(response.context['groups']), self.groups[1::-1]
+        )
+
+    def test_group_page_shows_stats(self):
+        response = self.client.get(
+            reverse('posts:group_list', args=[self.groups[1].slug])
+        )
+        group = response.context['group']
+        self.assertEqual((group.posts_hour, group.authors_week), (2, 1))
+
+
+@override_settings(MAX_PAGE_AMOUNT=2)
+class PopularFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='leo')
+        now = timezone.now()
+        half_life = timedelta(seconds=settings.HOT_HALF_LIFE)
+        cls.old, cls.fresh, cls.newest = create_posts([
+            Post(author=cls.author, text='Старый',
+                 pub_date=now - 2 * half_life),
+            Post(author=cls.author, text='Свежий',
+                 pub_date=now - timedelta(minutes=10)),
+            Post(author=cls.author, text='Новый', pub_date=now),
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def feed(self, **params):
+        response = self.client.get(reverse('posts:popular'), params)
+        return response.context['page_obj']
+
+    def test_comments_lift_posts_with_decay(self):
+        """Обсуждение поднимает пост, но с возрастом весит меньше."""
+        self.assertEqual(list(self.feed()), [self.newest, self.fresh])
+        for _ in range(2):
+            self.fresh.comments.create(author=self.author, text='Да')
+        self.old.comments.create(author=self.author, text='Нет')
+        page = self.feed()
+        self.assertEqual(list(page), [self.fresh, self.newest])
+        self.assertEqual(list(self.feed(cursor=page.next_cursor)), [self.old])
+
+    def test_cursor_of_wrong_type_returns_first_page(self):
+        """Дата вместо популярности в курсоре — первая страница."""
+        cursor = raw_cursor(timezone.now().isoformat(), self.old.pk, False)
+        self.assertEqual(
+            list(self.feed(cursor=cursor)), [self.newest, self.fresh]
+        )
+
+    def test_hot_change_matches_recount(self):
+        comment = self.old.comments.create(author=self.author, text='Да')
+        self.old.comments.create(author=self.author, text='Нет')
+        comment.delete()
+        self.old.refresh_from_db()
+        self.assertAlmostEqual(
+            self.old.hot, hot_score(self.old.pub_date, 1), places=6
+        )
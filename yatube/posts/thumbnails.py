@@ -0,0 +1,137 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.images import get_image_dimensions
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models import F
+from sorl.thumbnail import get_thumbnail
+
+from core.metrics import timed
+
+from . import fragments
+from .models import Post
+
+CARD_WIDTHS = (320, 640, 960, 1920)
+CARD_DEFAULT_WIDTH = 960
+CARD_RATIO = 339 / 960
+CARD_FORMATS = ('WEBP', 'JPEG')
+CARD_OPTIONS = {'crop': 'center'}
+# Готовые варианты картинки лежат в кэше миниатюр одной записью: карточка
+# читает её без обращения к sorl и файлам.
+CARD_KEY = 'card_variants:{}'
+
+logger = logging.getLogger(__name__)
+pending = set()
+pending_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def executor(workers):
+    return ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix='thumbnails'
+    )
+
+
+def card_widths(source_width):
+    """Ширины вариантов не больше исходной картинки.
+
+    Картинки не увеличиваются, и вариант шире исходной был бы её копией.
+    Узкая картинка получает один вариант своей ширины.
+    """
+    widths = [width for width in CARD_WIDTHS if width <= source_width]
+    return widths or [source_width]
+
+
+def card_variants(source_width):
+    """Формат и геометрия каждого варианта картинки карточки."""
+    for image_format in CARD_FORMATS:
+        for width in card_widths(source_width):
+            height = max(1, round(width * CARD_RATIO))
+            yield image_format, f'{width}x{height}'
+
+
+def cached_variants(name):
+    """URL и ширина готовых вариантов по форматам; None, пока их нет."""
+    return caches[settings.THUMBNAIL_CACHE].get(CARD_KEY.format(name))
+
+
+def generate(post_id, name):
+    """Создаёт варианты картинки и сбрасывает кэш карточки."""
+    if cached_variants(name) is not None:
+        return
+    with default_storage.open(name) as file:
+        source_width, _ = get_image_dimensions(file)
+    variants = {image_format: [] for image_format in CARD_FORMATS}
+    for image_format, geometry in card_variants(source_width):
+        # Уже созданные файлы sorl находит в своём kvstore.
+        thumbnail = get_thumbnail(
+            name, geometry, format=image_format, **CARD_OPTIONS
+        )
+        variants[image_format].append((thumbnail.url, thumbnail.width))
+    caches[settings.THUMBNAIL_CACHE].set(CARD_KEY.format(name), variants)
+    posts = Post.objects.filter(pk=post_id)
+    posts.update(version=F('version') + 1)
+    for author_id, group_id in posts.values_list('author_id', 'group_id'):
+        fragments.bump_post_versions([author_id], [group_id])
+
+
+def generate_logged(post_id, name):
+    try:
+        generate(post_id, name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюру %s', name)
+
+
+def generate_in_background(post_id, name):
+    try:
+        generate_logged(post_id, name)
+    finally:
+        with pending_lock:
+            pending.discard(name)
+        connections.close_all()
+
+
+def submit(post_id, name):
+    """Создаёт миниатюру в пуле потоков; без потоков — сразу."""
+    if not settings.THUMBNAIL_WORKERS:
+        generate_logged(post_id, name)
+        return
+    with pending_lock:
+        if name in pending:
+            return
+        pending.add(name)
+    executor(settings.THUMBNAIL_WORKERS).submit(
+        generate_in_background, post_id, name
+    )
+
+
+def schedule(post):
+    """Ставит миниатюру в очередь после фиксации транзакции."""
+    transaction.on_commit(lambda: submit(post.pk, post.image.name))
+
+
+@timed('thumbnail')
+def card_picture(post):
+    """Варианты картинки для srcset; исходная картинка, пока их нет."""
+    variants = cached_variants(post.image.name)
+    if variants is None:
+        schedule(post)
+        return {'src': post.image.url}
+    fallback, _ = min(
+        variants['JPEG'],
+        key=lambda variant: abs(variant[1] - CARD_DEFAULT_WIDTH),
+    )
+    return {
+        'src': fallback,
+        'srcset': srcset(variants['JPEG']),
+        'webp_srcset': srcset(variants['WEBP']),
+    }
+
+
+def srcset(variants):
+    return ', '.join(f'{url} {width}w' for url, width in variants)
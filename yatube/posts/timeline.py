@@ -0,0 +1,115 @@
+from django.conf import settings
+
+from .models import Follow, Post, TimelineEntry, UserStats
+from .utils import CursorPaginator, keyset_slice
+
+BATCH_SIZE = 500
+
+
+def is_heavy_author(author_id):
+    """Посты автора читаются при показе ленты, а не раскладываются."""
+    return UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).exists()
+
+
+def heavy_authors(user):
+    """Авторы из подписок пользователя, которые не раскладываются."""
+    return list(
+        Follow.objects.filter(
+            user=user,
+            author__stats__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+        ).values_list('author', flat=True)
+    )
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    fan_out_many([post])
+
+
+def fan_out_many(posts):
+    """Раскладывает пачку новых постов по лентам подписчиков авторов."""
+    author_ids = {post.author_id for post in posts}
+    heavy = UserStats.objects.filter(
+        user_id__in=author_ids,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).values_list('user_id', flat=True)
+    followers = {}
+    for author_id, user_id in Follow.objects.filter(
+        author_id__in=author_ids.difference(heavy)
+    ).values_list('author_id', 'user_id').iterator():
+        followers.setdefault(author_id, []).append(user_id)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post.pk,
+                author_id=post.author_id,
+                pub_date=post.pub_date,
+            )
+            for post in posts
+            for user_id in followers.get(post.author_id, ())
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту подписчика уже опубликованные посты автора."""
+    if is_heavy_author(author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'pub_date')
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for post_id, pub_date in posts.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты посты автора, от которого отписались."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+class TimelinePaginator(CursorPaginator):
+    """Лента подписок: разложенные записи плюс посты тяжёлых авторов."""
+
+    def __init__(self, object_list, per_page, user, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.user = user
+
+    def fetch(self, position, limit):
+        post_ids = keyset_slice(
+            TimelineEntry.objects.filter(user=self.user),
+            position,
+            limit,
+            pk_field='post_id',
+        ).values_list('post_id', flat=True)
+        posts = Post.objects.feed().in_bulk(list(post_ids))
+        authors = heavy_authors(self.user)
+        if authors:
+            posts.update(
+                (post.pk, post) for post in keyset_slice(
+                    Post.objects.feed().filter(author__in=authors),
+                    position,
+                    limit,
+                )
+            )
+        backwards = position is not None and position[2]
+        return sorted(
+            posts.values(),
+            key=lambda post: (post.pub_date, post.pk),
+            reverse=not backwards,
+        )[:limit]
@@ -7,8 +7,11 @@ app_name = "posts"
 
 urlpatterns = [
     path("", views.index, name="index"),
+    path('popular/', views.popular, name='popular'),
     path("group/<slug:slug>/", views.group_posts, name="group_list"),
+    path('trending/', views.trending, name='trending'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path('search/', views.search, name='search'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
@@ -17,6 +20,7 @@ urlpatterns = [
         views.add_comment,
         name='add_comment'
     ),
+    path('export/<str:dataset>/', views.export_data, name='export_data'),
     path('follow/', views.follow_index, name='follow_index'),
     path(
         'profile/<str:username>/follow/',
@@ -1,7 +1,130 @@
-from django.core.paginator import Paginator
+import base64
+import json
+from datetime import datetime
 
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
 
-def paginator_function(posts, request):
-    paginator = Paginator(posts, 10)
+
+def encode_cursor(obj, backwards=False, date_field='pub_date'):
+    """Непрозрачный курсор по ключу (дата, id) записи; вместо даты может
+    быть число, например популярность или сам id."""
+    value = getattr(obj, date_field)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    position = [value, obj.pk, backwards]
+    return base64.urlsafe_b64encode(
+        json.dumps(position).encode()
+    ).decode()
+
+
+def decode_cursor(cursor, value_type=datetime):
+    """Разбирает курсор; для пустого, испорченного или с ключом не того
+    типа, что value_type поля пагинации, возвращает None."""
+    if not cursor:
+        return None
+    try:
+        value, pk, backwards = json.loads(
+            base64.urlsafe_b64decode(cursor.encode())
+        )
+        if value_type is datetime and isinstance(value, str):
+            value = parse_datetime(value)
+    except (ValueError, TypeError):
+        return None
+    if (
+        type(value) is not value_type
+        or type(pk) is not int
+    ):
+        return None
+    return value, pk, bool(backwards)
+
+
+def keyset_slice(queryset, position, limit, pk_field='pk',
+                 date_field='pub_date'):
+    """Строки после позиции курсора в порядке (date_field, pk_field)."""
+    if position is None:
+        return queryset.order_by(
+            '-' + date_field, '-' + pk_field
+        )[:limit]
+    date, pk, backwards = position
+    # Отдельное условие на дату даёт поиск по диапазону индекса:
+    # из одного OR план читал бы индекс с самого начала.
+    if backwards:
+        return queryset.filter(**{date_field + '__gte': date}).filter(
+            Q(**{date_field + '__gt': date}) | Q(**{pk_field + '__gt': pk})
+        ).order_by(date_field, pk_field)[:limit]
+    return queryset.filter(**{date_field + '__lte': date}).filter(
+        Q(**{date_field + '__lt': date}) | Q(**{pk_field + '__lt': pk})
+    ).order_by('-' + date_field, '-' + pk_field)[:limit]
+
+
+class CursorPaginator(Paginator):
+    """Постраничный вывод по ключу (дата, id) без OFFSET и COUNT."""
+    cursor_based = True
+    date_field = 'pub_date'
+    # Тип значения date_field в курсоре.
+    value_type = datetime
+
+    def __init__(self, object_list, per_page, **kwargs):
+        super().__init__(
+            object_list.order_by('-' + self.date_field, '-pk'),
+            per_page,
+            **kwargs
+        )
+
+    def get_cursor_page(self, cursor=None):
+        position = decode_cursor(cursor, self.value_type)
+        backwards = position is not None and position[2]
+        objects = self.fetch(position, self.per_page + 1)
+        has_more = len(objects) > self.per_page
+        objects = objects[:self.per_page]
+        if backwards:
+            objects.reverse()
+        has_next = has_more or backwards
+        has_previous = position is not None and (has_more or not backwards)
+        page = Page(objects, 1, self)
+        page.next_cursor = None
+        page.previous_cursor = None
+        if objects and has_next:
+            page.next_cursor = encode_cursor(
+                objects[-1], date_field=self.date_field
+            )
+        if objects and has_previous:
+            page.previous_cursor = encode_cursor(
+                objects[0], backwards=True, date_field=self.date_field
+            )
+        return page
+
+    def fetch(self, position, limit):
+        """Записи после позиции курсора в порядке обхода."""
+        return list(keyset_slice(
+            self.object_list, position, limit, date_field=self.date_field
+        ))
+
+
+class CommentPaginator(CursorPaginator):
+    """Комментарии поста страницами, от новых к старым."""
+    date_field = 'created'
+
+
+class HotPaginator(CursorPaginator):
+    """Посты от самых популярных, см. posts.ranking."""
+    date_field = 'hot'
+    value_type = float
+
+
+class IdPaginator(CursorPaginator):
+    """Записи без даты, от новых к старым по id."""
+    date_field = 'id'
+    value_type = int
+
+
+def paginator_function(posts, request, paginator_class=CursorPaginator,
+                       **kwargs):
+    paginator = paginator_class(posts, settings.MAX_PAGE_AMOUNT, **kwargs)
     page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+    if page_number:
+        return paginator.get_page(page_number)
+    return paginator.get_cursor_page(request.GET.get('cursor'))
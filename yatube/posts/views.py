@@ -1,25 +1,62 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render, redirect
 
+from core.routers import read_from_replica, writes_on_get
+
+from .activity import move_post, trending_groups, with_stats
+from .conditional import (activity_etag, activity_last_modified, conditional,
+                          feed_etag, feed_last_modified, follow_etag,
+                          follow_last_modified, group_etag,
+                          group_last_modified, post_etag, profile_etag,
+                          profile_last_modified)
+from .export import DATASETS, FORMATS, export_lines
 from .forms import CommentForm, PostForm
+from .fragments import bump_post_versions, feed_version
+from .middleware import cache_anonymous_page
 from .models import Follow, Group, Post, User
-from .utils import paginator_function
+from .search import search_page
+from .timeline import TimelinePaginator
+from .utils import CommentPaginator, HotPaginator, paginator_function
 
 
+@read_from_replica
+@conditional(feed_etag, feed_last_modified)
+@cache_anonymous_page
 def index(request):
     template = "posts/index.html"
-    post_list = Post.objects.all()
+    post_list = Post.objects.feed()
     page_obj = paginator_function(post_list, request)
     context = {
         'page_obj': page_obj,
+        'feed_version': feed_version(),
+    }
+    return render(request, template, context)
+
+
+@read_from_replica
+@conditional(feed_etag, feed_last_modified)
+@cache_anonymous_page
+def popular(request):
+    template = "posts/popular.html"
+    page_obj = paginator_function(Post.objects.feed(), request, HotPaginator)
+    context = {
+        'page_obj': page_obj,
+        'feed_version': feed_version(),
     }
     return render(request, template, context)
 
 
+@read_from_replica
+@conditional(group_etag, group_last_modified)
+@cache_anonymous_page
 def group_posts(request, slug):
     template = "posts/group_list.html"
-    group = get_object_or_404(Group, slug=slug)
-    group_all = group.posts.all()
+    group = get_object_or_404(with_stats(Group.objects.all()), slug=slug)
+    group_all = group.posts.feed()
     page_obj = paginator_function(group_all, request)
     context = {
         "group": group,
@@ -28,10 +65,26 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@read_from_replica
+@conditional(activity_etag, activity_last_modified)
+@cache_anonymous_page
+def trending(request):
+    template = "posts/trending.html"
+    context = {
+        'groups': trending_groups(),
+    }
+    return render(request, template, context)
+
+
+@read_from_replica
+@conditional(profile_etag, profile_last_modified)
+@cache_anonymous_page
 def profile(request, username):
     template = "posts/profile.html"
-    author = get_object_or_404(User, username=username)
-    posts_all = author.posts.all()
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    posts_all = author.posts.feed()
     page_obj = paginator_function(posts_all, request)
     following = False
     context = {
@@ -42,12 +95,32 @@ def profile(request, username):
     return render(request, template, context)
 
 
+def search(request):
+    template = "posts/search.html"
+    query = request.GET.get('q', '')
+    page_obj = search_page(query, request.GET.get('page'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, template, context)
+
+
+@read_from_replica
+@conditional(post_etag)
+@cache_anonymous_page
 def post_detail(request, post_id):
     template = "posts/post_detail.html"
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), id=post_id
+    )
     form = CommentForm(request.POST or None, files=request.FILES or None,)
-    comments = post.comments.all()
-    post = get_object_or_404(Post, id=post_id)
+    comments = CommentPaginator(
+        post.comments.select_related('author').only(
+            'text', 'created', 'post_id', 'author_id', 'author__username'
+        ),
+        settings.COMMENTS_PAGE_AMOUNT,
+    ).get_cursor_page(request.GET.get('cursor'))
     context = {
         'post': post,
         'comments': comments,
@@ -58,6 +131,7 @@ def post_detail(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     form = CommentForm(request.POST or None)
     post = get_object_or_404(Post, id=post_id)
@@ -70,6 +144,7 @@ def add_comment(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def post_create(request):
     template = "posts/create_post.html"
     form = PostForm(
@@ -94,6 +169,7 @@ def post_edit(request, post_id):
     )
     if request.user != post.author:
         return redirect('posts:post_detail', post_id=post_id)
+    old_group_id = post.group_id
     form = PostForm(
         request.POST,
         files=request.FILES or None,
@@ -105,21 +181,37 @@ def post_edit(request, post_id):
             'post_id': post_id,
             'is_edit': True
         })
-    form.save()
+    with transaction.atomic():
+        # Только поля формы и версия: счётчики в загруженном посте могли
+        # устареть.
+        form.save(commit=False).save(
+            update_fields=[*PostForm.Meta.fields, 'version']
+        )
+        if post.group_id != old_group_id:
+            move_post(post, old_group_id)
+            bump_post_versions(group_ids=[old_group_id])
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@read_from_replica
 @login_required
+@conditional(follow_etag, follow_last_modified)
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginator_function(post_list, request)
+    post_list = Post.objects.feed().filter(
+        author__following__user=request.user
+    )
+    page_obj = paginator_function(
+        post_list, request, TimelinePaginator, user=request.user
+    )
     context = {
         'page_obj': page_obj
     }
     return render(request, 'posts/follow.html', context)
 
 
+@writes_on_get
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if request.user != author:
@@ -130,8 +222,31 @@ def profile_follow(request, username):
     return redirect('posts:profile', username)
 
 
+@writes_on_get
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:profile', username=author.username)
+
+
+@staff_member_required
+def export_data(request, dataset):
+    format = request.GET.get('format', 'jsonl')
+    if dataset not in DATASETS or format not in FORMATS:
+        raise Http404
+    try:
+        after = int(request.GET.get('after', 0))
+    except ValueError:
+        after = 0
+    response = StreamingHttpResponse(
+        export_lines(dataset, format, after),
+        content_type=(
+            'text/csv' if format == 'csv' else 'application/x-ndjson'
+        ) + '; charset=utf-8',
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{dataset}.{format}"'
+    )
+    return response
@@ -13,6 +13,20 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 import os
 
 MAX_PAGE_AMOUNT = 10
+COMMENTS_PAGE_AMOUNT = 20
+# Записей на странице API по умолчанию и наибольшее значение ?limit=.
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+# Авторы с большим числом подписчиков не раскладываются по лентам,
+# их посты подмешиваются в ленту подписок при чтении.
+TIMELINE_FANOUT_LIMIT = 10000
+# Поиск: fts5, table (индекс в обычной таблице) или auto — fts5, если
+# SQLite собран с его поддержкой.
+SEARCH_BACKEND = 'auto'
+SEARCH_MAX_RESULTS = 1000
+# За столько секунд вес обсуждения в популярном вдвое падает: свежий пост
+# с N комментариями равен посту того же возраста минус период с 2N + 1.
+HOT_HALF_LIFE = 60 * 60 * 12
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -33,11 +47,87 @@ ALLOWED_HOSTS = [
     'testserver',
 ]
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Кэш общий для всех алиасов: locmem для разработки, file или memcached
+# (например, unix:/run/memcached.sock), чтобы процессы gunicorn видели
+# одни и те же данные. Алиасы разделяются префиксом ключей. Бэкенды из
+# core.metrics — стандартные бэкенды Django с учётом попаданий в метриках.
+CACHE_BACKENDS = {
+    'locmem': 'core.metrics.backends.LocMemCache',
+    'file': 'core.metrics.backends.FileBasedCache',
+    'memcached': 'core.metrics.backends.MemcachedCache',
+}
+CACHE_BACKEND = os.environ.get('YATUBE_CACHE_BACKEND', 'locmem')
+CACHE_LOCATION = os.environ.get(
+    'YATUBE_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')
+)
+CACHE_KEY_PREFIX = os.environ.get('YATUBE_CACHE_KEY_PREFIX', 'yatube')
+# Записей в общем хранилище locmem и file, сверх которых удаляется треть.
+# Каждый алиас сравнивает с пределом число записей всех алиасов, поэтому
+# предел один на всех; 300 по умолчанию у Django хватает на несколько
+# страниц. memcached вытесняет записи сам по памяти сервера.
+CACHE_MAX_ENTRIES = int(os.environ.get('YATUBE_CACHE_MAX_ENTRIES', 50000))
+
+
+def cache_alias(name, timeout):
+    config = {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': CACHE_LOCATION,
+        'KEY_PREFIX': f'{CACHE_KEY_PREFIX}:{name}',
+        'TIMEOUT': timeout,
     }
+    # OPTIONS memcached передаются клиенту, MAX_ENTRIES он не знает.
+    if CACHE_BACKEND != 'memcached':
+        config['OPTIONS'] = {'MAX_ENTRIES': CACHE_MAX_ENTRIES}
+    return config
+
+
+CACHES = {
+    'default': cache_alias('default', 300),
+    'fragments': cache_alias('fragments', 60 * 60),
+    'sessions': cache_alias('sessions', 60 * 60 * 24 * 14),
+    'thumbnails': cache_alias('thumbnails', None),
 }
+# Сколько хранятся страницы лент и постов для анонимов.
+PAGE_CACHE_TIMEOUT = 60 * 10
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'sessions'
+THUMBNAIL_CACHE = 'thumbnails'
+# Потоки, в которых миниатюры создаются после сохранения поста. При 0
+# миниатюры создаются сразу после фиксации транзакции; тесты миниатюр
+# ставят 0, чтобы фоновая задача не пережила тест, его базу и MEDIA_ROOT.
+THUMBNAIL_WORKERS = int(os.getenv('YATUBE_THUMBNAIL_WORKERS', 2))
+
+# Метрики запросов в формате Prometheus на /metrics и, по желанию,
+# заголовок Server-Timing с временем базы, шаблонов, кэша и миниатюр.
+METRICS_ENABLED = os.getenv('YATUBE_METRICS', '') == '1'
+METRICS_SERVER_TIMING = os.getenv('YATUBE_SERVER_TIMING', '') == '1'
+# Prometheus передаёт его в заголовке Authorization: Bearer <токен>.
+# Без токена /metrics закрыт.
+METRICS_TOKEN = os.getenv('YATUBE_METRICS_TOKEN', '')
+# Запросы к базе дольше порога в мс пишутся в JSONL с планом выполнения,
+# сводка — на admin/slow-queries/. 0 — журнал выключен.
+SLOW_QUERY_MS = float(os.getenv('YATUBE_SLOW_QUERY_MS', 0))
+SLOW_QUERY_LOG = os.getenv(
+    'YATUBE_SLOW_QUERY_LOG',
+    os.path.join(BASE_DIR, 'logs', 'slow_queries.jsonl'),
+)
+# Параметры запросов пишутся в журнал только по явному согласию: в них
+# бывают хэши паролей и ключи сессий. Запросы к таблицам из
+# SLOW_QUERY_PRIVATE_TABLES пишутся без параметров всегда.
+SLOW_QUERY_PARAMS = os.getenv('YATUBE_SLOW_QUERY_PARAMS', '') == '1'
+SLOW_QUERY_PRIVATE_TABLES = ('auth_user', 'django_session')
+SLOW_QUERY_LOG_BYTES = 10 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 5
+# Персонал может профилировать запрос: ?profile=cpu, memory или all либо
+# заголовок X-Profile. Хранятся последние PROFILE_KEEP замеров, сводка —
+# на admin/profiles/.
+PROFILE_ENABLED = os.getenv('YATUBE_PROFILE', '1') == '1'
+PROFILE_PARAMETER = 'profile'
+PROFILE_DIR = os.getenv(
+    'YATUBE_PROFILE_DIR', os.path.join(BASE_DIR, 'logs', 'profiles')
+)
+PROFILE_KEEP = 100
+PROFILE_TOP = 30
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 # Application definition
@@ -46,6 +136,7 @@ INSTALLED_APPS = [
     "core.apps.CoreConfig",
     "users.apps.UsersConfig",
     "posts.apps.PostsConfig",
+    "api.apps.ApiConfig",
     "django.contrib.admin",
     "django.contrib.auth",
     "django.contrib.contenttypes",
@@ -56,11 +147,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.metrics.middleware.MetricsMiddleware",
+    "core.metrics.middleware.SlowQueryMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.routers.PrimaryStickinessMiddleware",
+    "core.metrics.middleware.ProfilingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -70,7 +165,7 @@ ROOT_URLCONF = "yatube.urls"
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "core.metrics.backends.DjangoTemplates",
         "DIRS": [TEMPLATES_DIR],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -92,10 +187,42 @@ WSGI_APPLICATION = "yatube.wsgi.application"
 
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
+        # sqlite3 Django, но транзакции начинаются с BEGIN IMMEDIATE.
+        "ENGINE": "core.sqlite",
         "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
+        "CONN_MAX_AGE": 60,
+    }
+}
+# Применяются к каждому соединению с SQLite. WAL позволяет читать во время
+# записи, NORMAL в режиме WAL не теряет согласованность при сбое процесса.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение — размер в КиБ, здесь 64 МиБ.
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+}
+
+# Реплики только для чтения: пути к копиям базы через запятую. Ленты и
+# страница поста читают с них; отдельные тестовые базы для реплик не
+# создаются.
+REPLICA_DATABASES = {
+    f'replica{number}': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'CONN_MAX_AGE': 60,
+        'TEST': {'MIRROR': 'default'},
     }
+    for number, name in enumerate(
+        filter(None, os.environ.get('YATUBE_DB_REPLICAS', '').split(',')),
+        1,
+    )
 }
+DATABASES.update(REPLICA_DATABASES)
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Сколько секунд после записи пользователь читает с основной базы.
+REPLICA_STICKY_SECONDS = 10
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -0,0 +1,7 @@
+"""Настройки для тестов pytest: как основные, но без фоновых потоков."""
+
+from .settings import *  # noqa: F401,F403
+
+# Тесты с transaction=True выполняют on_commit: миниатюра создаётся сразу,
+# а не в потоке, который переживёт тест и его базу.
+THUMBNAIL_WORKERS = 0
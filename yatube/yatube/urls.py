@@ -18,11 +18,27 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core.metrics.views import (metrics, profile_detail, profile_download,
+                                profiles, slow_queries)
 
 urlpatterns = [
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
+    path('api/v1/', include('api.urls', namespace='api')),
+    path('metrics', metrics, name='metrics'),
     path("", include("posts.urls", namespace="posts")),
+    path('admin/slow-queries/', slow_queries, name='slow_queries'),
+    path('admin/profiles/', profiles, name='profiles'),
+    path(
+        'admin/profiles/<str:capture_id>/',
+        profile_detail,
+        name='profile_detail',
+    ),
+    path(
+        'admin/profiles/<str:capture_id>/download/',
+        profile_download,
+        name='profile_download',
+    ),
     path("admin/", admin.site.urls),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),